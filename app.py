@@ -2,17 +2,27 @@ import base64
 import hashlib
 import html
 import os
+import json
 import time
-from typing import Dict, List, Optional
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
 
 import streamlit as st
 import streamlit.components.v1 as components
+from streamlit import runtime
 
-from backend.auth_db import verify_user_credentials
+from backend.auth_db import (
+    AuthConnectionPool,
+    CredentialCache,
+    verify_user_credentials,
+)
 from backend.config import get_settings
-from backend.memory_agent import build_memory_graph, run_chat
+from backend.media_store import MediaStore
+from backend.metrics import start_metrics_exporter
 from backend.prompts import INITIAL_ASSISTANT_MESSAGE, SYSTEM_CHAT_PROMPT
-from backend.voice import text_to_speech, transcribe_audio
+from backend.runtime import get_runtime as build_runtime, start_warmup
+from backend.session_history import SessionHistory
+from backend.tts_pipeline import SentenceSynthesizer
 
 
 APP_TITLE = "ETERNUM"
@@ -20,6 +30,7 @@ LOGO_PATH = os.path.join("assets", "logo.png")
 CHAT_ICON = "\N{SPEECH BALLOON}"
 VOICE_ICON = "\N{MICROPHONE}"
 VOICE_INTRO_PATH = os.path.join("assets", "mensaje_inicial.mp3")
+CHAT_PAGE_SIZE = 40
 VOICE_TAGS_CATALOG = (
     "[laughs], [laughs harder], [starts laughing], [wheezing]\n"
     "[whispers]\n"
@@ -49,10 +60,32 @@ def load_logo_data_uri(path: str) -> str:
     return f"data:image/png;base64,{encoded}"
 
 
-def audio_to_data_uri(audio_bytes: bytes, mime_type: Optional[str]) -> str:
-    encoded = base64.b64encode(audio_bytes).decode("ascii")
-    safe_mime = mime_type or "audio/mpeg"
-    return f"data:{safe_mime};base64,{encoded}"
+@st.cache_resource
+def get_media_store() -> MediaStore:
+    settings = get_settings()
+    return MediaStore(settings.media_store_dir, settings.media_store_max_bytes)
+
+
+def store_audio(audio_bytes: bytes, mime_type: Optional[str]) -> str:
+    return get_media_store().put(audio_bytes, mime_type or "audio/mpeg")
+
+
+def media_url(media_id: Optional[str]) -> str:
+    # El audio se sirve desde el gestor de medios de Streamlit (/media/...),
+    # asi que el HTML de cada rerun solo lleva URLs y no base64.
+    if not media_id:
+        return ""
+    urls = st.session_state.media_urls
+    if media_id in urls:
+        return urls[media_id]
+    media = get_media_store().get(media_id)
+    if media is None:
+        return ""
+    data, mime_type = media
+    urls[media_id] = runtime.get_instance().media_file_mgr.add(
+        data, mime_type, f"eternum-media-{media_id}"
+    )
+    return urls[media_id]
 
 
 def build_system_prompt(mode: str) -> str:
@@ -61,14 +94,22 @@ def build_system_prompt(mode: str) -> str:
     return f"{SYSTEM_CHAT_PROMPT}\n\n{TEXT_MODE_INSTRUCTIONS}"
 
 
+def new_session_history() -> SessionHistory:
+    settings = get_settings()
+    return SessionHistory(settings.session_spill_dir, settings.session_hot_messages)
+
+
 def initialize_chat_state(user_name: str) -> None:
-    st.session_state.messages = [
-        {"role": "system", "content": build_system_prompt(st.session_state.mode)},
-        {"role": "assistant", "content": build_initial_message(user_name)},
-    ]
-    st.session_state.voice_messages = []
+    # El prompt de sistema no se guarda en el historial: se construye segun
+    # el modo en cada turno.
+    st.session_state.messages = new_session_history()
+    st.session_state.messages.append(
+        {"role": "assistant", "content": build_initial_message(user_name)}
+    )
+    st.session_state.voice_messages = new_session_history()
     st.session_state.last_audio_hash = None
     st.session_state.voice_debug = []
+    st.session_state.visible_messages = CHAT_PAGE_SIZE
 
 
 def ensure_chat_state() -> None:
@@ -83,22 +124,18 @@ def ensure_chat_state() -> None:
         initialize_chat_state(user_name)
 
 
-def sync_system_prompt_for_mode() -> None:
-    if "messages" not in st.session_state or not st.session_state.messages:
-        return
-    if st.session_state.messages[0].get("role") == "system":
-        st.session_state.messages[0]["content"] = build_system_prompt(
-            st.session_state.mode
-        )
-
-
 def clear_chat_state() -> None:
+    for key in ("messages", "voice_messages"):
+        history = st.session_state.get(key)
+        if isinstance(history, SessionHistory):
+            history.close()
     for key in (
         "messages",
         "voice_messages",
         "last_audio_hash",
         "voice_debug",
         "chat_owner",
+        "visible_messages",
     ):
         st.session_state.pop(key, None)
 
@@ -115,6 +152,35 @@ def load_audio_bytes(path: str) -> Optional[bytes]:
         return handle.read()
 
 
+@st.cache_resource
+def start_metrics() -> bool:
+    settings = get_settings()
+    if not settings.metrics_enabled:
+        return False
+    start_metrics_exporter(
+        settings.metrics_port,
+        settings.metrics_file,
+        settings.metrics_file_interval_seconds,
+    )
+    return True
+
+
+@st.cache_resource
+def get_auth_pool() -> AuthConnectionPool:
+    settings = get_settings()
+    return AuthConnectionPool(
+        settings.database_url,
+        settings.auth_pool_min,
+        settings.auth_pool_max,
+        settings.auth_pool_timeout_seconds,
+    )
+
+
+@st.cache_resource
+def get_credential_cache() -> CredentialCache:
+    return CredentialCache(get_settings().auth_cache_ttl_seconds)
+
+
 def render_login() -> None:
     settings = get_settings()
     st.markdown(
@@ -156,9 +222,17 @@ div[data-testid="stForm"] form {
     if submitted:
         if not username.strip() or not password:
             st.session_state.auth_error = "Completa usuario y clave."
+        elif not settings.database_url:
+            st.session_state.auth_error = "DATABASE_URL no configurada."
         else:
             try:
-                if verify_user_credentials(username, password, settings):
+                if verify_user_credentials(
+                    username,
+                    password,
+                    settings,
+                    pool=get_auth_pool(),
+                    cache=get_credential_cache(),
+                ):
                     st.session_state.authenticated = True
                     st.session_state.auth_error = ""
                     st.session_state.login_user = username.strip()
@@ -175,7 +249,7 @@ div[data-testid="stForm"] form {
 
 
 def clear_voice_autoplay_flags() -> None:
-    for message in st.session_state.voice_messages:
+    for message in st.session_state.voice_messages.hot():
         if message.get("autoplay"):
             message["autoplay"] = False
 
@@ -190,7 +264,7 @@ def add_voice_intro_message() -> None:
         {
             "role": "assistant",
             "transcript": "",
-            "audio_uri": audio_to_data_uri(audio_bytes, "audio/mpeg"),
+            "audio_id": store_audio(audio_bytes, "audio/mpeg"),
             "autoplay": True,
         }
     )
@@ -203,68 +277,136 @@ def build_initial_message(user_name: str) -> str:
     return INITIAL_ASSISTANT_MESSAGE.format(name=name)
 
 
-def build_messages_html(messages: List[Dict[str, str]], thinking: bool = False) -> str:
+def visible_message_limit() -> int:
+    return st.session_state.get("visible_messages", CHAT_PAGE_SIZE)
+
+
+def window_messages(
+    messages: SessionHistory, limit: int
+) -> Tuple[int, List[Dict[str, str]]]:
+    window = messages.tail(limit)
+    return len(messages) - len(window), window
+
+
+def build_older_notice_html(hidden: int) -> str:
+    if not hidden:
+        return ""
+    return f'<div class="chat-empty">{hidden} mensajes anteriores ocultos.</div>'
+
+
+@lru_cache(maxsize=4096)
+def build_message_fragment(role: str, content: str) -> str:
+    label = "YOU" if role == "user" else APP_TITLE
+    safe = html.escape(content).replace("\n", "<br>")
+    css_class = "msg user" if role == "user" else "msg assistant"
+    return (
+        f'<div class="{css_class}">'
+        f'<div class="msg-role">{label}</div>'
+        f'<div class="msg-content">{safe}</div>'
+        f"</div>"
+    )
+
+
+@lru_cache(maxsize=4096)
+def build_voice_message_fragment(
+    role: str, transcript: str, audio_url: str, autoplay: bool
+) -> str:
+    label = "YOU" if role == "user" else APP_TITLE
+    safe_transcript = html.escape(transcript).replace("\n", "<br>")
+    autoplay_attr = " autoplay" if autoplay else ""
+    css_class = "msg user" if role == "user" else "msg assistant"
+    audio_tag = ""
+    if audio_url:
+        audio_tag = (
+            f'<audio class="voice-audio" controls preload="metadata"{autoplay_attr} '
+            f'src="{audio_url}"></audio>'
+        )
+    transcript_tag = (
+        f'<div class="msg-transcript">{safe_transcript}</div>'
+        if safe_transcript
+        else ""
+    )
+    content = f'<div class="voice-stack">{audio_tag}{transcript_tag}</div>'
+    return (
+        f'<div class="{css_class}">'
+        f'<div class="msg-role">{label}</div>'
+        f'<div class="msg-content">{content}</div>'
+        f"</div>"
+    )
+
+
+def build_messages_html(
+    messages: SessionHistory,
+    thinking: bool = False,
+    limit: Optional[int] = None,
+    pending: Optional[Dict[str, str]] = None,
+) -> str:
     if not messages and not thinking:
         return '<div class="chat-window"><div class="chat-empty">No messages yet.</div></div>'
 
-    parts = ['<div class="chat-window">']
-    for message in messages:
-        role = message.get("role", "assistant")
-        if role == "system":
-            continue
-        label = "YOU" if role == "user" else APP_TITLE
-        safe = html.escape(message.get("content", "")).replace("\n", "<br>")
-        css_class = "msg user" if role == "user" else "msg assistant"
+    hidden, window = window_messages(
+        messages, visible_message_limit() if limit is None else limit
+    )
+    parts = ['<div class="chat-window">', build_older_notice_html(hidden)]
+    for message in window:
+        parts.append(
+            build_message_fragment(
+                message.get("role", "assistant"), message.get("content", "")
+            )
+        )
+    if pending is not None:
+        # La respuesta parcial cambia con cada token: se renderiza sin la cache
+        # para no llenarla de prefijos que no se vuelven a pedir.
         parts.append(
-            f'<div class="{css_class}">'
-            f'<div class="msg-role">{label}</div>'
-            f'<div class="msg-content">{safe}</div>'
-            f"</div>"
+            build_message_fragment.__wrapped__(
+                pending.get("role", "assistant"), pending.get("content", "")
+            )
         )
     parts.append("</div>")
     return "\n".join(parts)
 
 
 def build_voice_messages_html(
-    messages: List[Dict[str, str]], thinking: bool = False
+    messages: SessionHistory,
+    thinking: bool = False,
+    limit: Optional[int] = None,
+    pending: Optional[Dict[str, str]] = None,
 ) -> str:
     if not messages and not thinking:
         return '<div class="chat-window"><div class="chat-empty">No messages yet.</div></div>'
 
-    parts = ['<div class="chat-window voice-chat">']
-    for message in messages:
-        role = message.get("role", "assistant")
-        if role == "system":
-            continue
-        label = "YOU" if role == "user" else APP_TITLE
-        transcript = html.escape(message.get("transcript", "") or "").replace(
-            "\n", "<br>"
-        )
-        audio_uri = message.get("audio_uri", "")
-        autoplay_attr = " autoplay" if message.get("autoplay") else ""
-        css_class = "msg user" if role == "user" else "msg assistant"
-        audio_tag = ""
-        if audio_uri:
-            audio_tag = (
-                f'<audio class="voice-audio" controls preload="metadata"{autoplay_attr} '
-                f'src="{audio_uri}"></audio>'
+    hidden, window = window_messages(
+        messages, visible_message_limit() if limit is None else limit
+    )
+    parts = ['<div class="chat-window voice-chat">', build_older_notice_html(hidden)]
+    for message in window:
+        parts.append(
+            build_voice_message_fragment(
+                message.get("role", "assistant"),
+                message.get("transcript", "") or "",
+                media_url(message.get("audio_id")),
+                bool(message.get("autoplay")),
             )
-        transcript_tag = (
-            f'<div class="msg-transcript">{transcript}</div>'
-            if transcript
-            else ""
         )
-        content = f'<div class="voice-stack">{audio_tag}{transcript_tag}</div>'
+    if pending is not None:
         parts.append(
-            f'<div class="{css_class}">'
-            f'<div class="msg-role">{label}</div>'
-            f'<div class="msg-content">{content}</div>'
-            f"</div>"
+            build_voice_message_fragment.__wrapped__(
+                pending.get("role", "assistant"),
+                pending.get("transcript", "") or "",
+                media_url(pending.get("audio_id")),
+                bool(pending.get("autoplay")),
+            )
         )
     parts.append("</div>")
     return "\n".join(parts)
 
 
+def render_load_older_button(messages: SessionHistory) -> None:
+    hidden, _ = window_messages(messages, visible_message_limit())
+    if hidden and st.button("Cargar mensajes anteriores", key="load-older"):
+        st.session_state.visible_messages = visible_message_limit() + CHAT_PAGE_SIZE
+
+
 def scroll_chat_to_bottom() -> None:
     components.html(
         """
@@ -302,6 +444,48 @@ tryAttach();
     )
 
 
+def enqueue_voice_audio(audio_url: str) -> None:
+    # El reproductor vive en la ventana padre para que los reruns del chat no
+    # corten el audio; cada fragmento se encola y suena en orden.
+    components.html(
+        f"""
+<script>
+const parentWin = window.parent;
+if (!parentWin.eternumVoiceQueue) {{
+  parentWin.eternumVoiceQueue = [];
+  parentWin.eternumVoicePlayer = new parentWin.Audio();
+  parentWin.eternumVoicePlayNext = new parentWin.Function(
+    "const next = window.eternumVoiceQueue.shift();" +
+    "if (next) {{ window.eternumVoicePlayer.src = next;" +
+    " window.eternumVoicePlayer.play().catch(() => {{}}); }}"
+  );
+  parentWin.eternumVoicePlayer.addEventListener(
+    "ended", parentWin.eternumVoicePlayNext
+  );
+}}
+parentWin.eternumVoiceQueue.push({json.dumps(audio_url)});
+const player = parentWin.eternumVoicePlayer;
+if (player.paused || player.ended) {{
+  parentWin.eternumVoicePlayNext();
+}}
+</script>
+""",
+        height=0,
+        width=0,
+    )
+
+
+def play_voice_chunks(futures: Iterable, audio_chunks: List[bytes]) -> None:
+    for future in futures:
+        try:
+            audio_bytes, mime = future.result()
+        except Exception as exc:
+            st.error(f"No se pudo generar el audio del asistente. Detalles: {exc}")
+            continue
+        audio_chunks.append(audio_bytes)
+        enqueue_voice_audio(media_url(store_audio(audio_bytes, mime)))
+
+
 def attach_chat_input_autoresize() -> None:
     components.html(
         """
@@ -337,10 +521,23 @@ attachAutoResize();
 
 
 @st.cache_resource
+def start_runtime_warmup() -> bool:
+    start_warmup(get_settings())
+    return True
+
+
 def get_runtime():
-    settings = get_settings()
-    graph = build_memory_graph(settings)
-    return settings, graph
+    chat_runtime = build_runtime(get_settings())
+    return chat_runtime.settings, chat_runtime.graph
+
+
+def update_history_summary() -> None:
+    # Pliega en segundo plano los turnos que ya no caben en la ventana reciente;
+    # el siguiente turno usa el resumen que este listo en ese momento.
+    history = st.session_state.messages
+    summarizer = build_runtime(get_settings()).summarizer
+    offset = history.summary.covered
+    summarizer.submit(history.summary, history.unsummarized(), offset)
 
 
 st.set_page_config(page_title=APP_TITLE, layout="wide")
@@ -676,6 +873,13 @@ st.markdown(
     unsafe_allow_html=True,
 )
 
+start_metrics()
+start_runtime_warmup()
+
+# Streamlit descarta al final de cada rerun los medios que no se registraron en
+# el, asi que las URLs solo se reutilizan dentro de la misma ejecucion.
+st.session_state.media_urls = {}
+
 if "authenticated" not in st.session_state:
     st.session_state.authenticated = False
 
@@ -702,17 +906,14 @@ if st.session_state.authenticated and st.session_state.login_user:
     st.session_state.tenant_id = st.session_state.login_user
 
 ensure_chat_state()
-sync_system_prompt_for_mode()
 
 left_col, right_col = st.columns([1, 4], gap="small")
 
 with left_col:
     if st.button(f"{CHAT_ICON} Modo chat", key="chat", help="Modo chat"):
         st.session_state.mode = "chat"
-        sync_system_prompt_for_mode()
     if st.button(f"{VOICE_ICON} Modo voz", key="voice", help="Modo voz"):
         st.session_state.mode = "voice"
-        sync_system_prompt_for_mode()
     st.markdown(
         f'<div class="mode-pill">Modo: {st.session_state.mode}</div>',
         unsafe_allow_html=True,
@@ -729,8 +930,12 @@ with left_col:
 with right_col:
     if st.session_state.mode == "voice":
         settings, graph = get_runtime()
+        from backend.memory_agent import run_chat_stream
+        from backend.voice import text_to_speech, transcribe_audio
+
         clear_voice_autoplay_flags()
         add_voice_intro_message()
+        render_load_older_button(st.session_state.voice_messages)
         voice_placeholder = st.empty()
         voice_placeholder.markdown(
             build_voice_messages_html(st.session_state.voice_messages),
@@ -758,14 +963,12 @@ with right_col:
                 audio_hash = hashlib.sha256(audio_bytes).hexdigest()
                 if audio_hash != st.session_state.last_audio_hash:
                     st.session_state.last_audio_hash = audio_hash
-                    user_audio_uri = audio_to_data_uri(
-                        audio_bytes, audio_input.type
-                    )
+                    user_audio_id = store_audio(audio_bytes, audio_input.type)
                     st.session_state.voice_messages.append(
                         {
                             "role": "user",
                             "transcript": "",
-                            "audio_uri": user_audio_uri,
+                            "audio_id": user_audio_id,
                             "autoplay": False,
                         }
                     )
@@ -790,7 +993,7 @@ with right_col:
                                 )
                     if not transcript:
                         transcript = "No se pudo transcribir el audio."
-                    st.session_state.voice_messages[-1]["transcript"] = transcript
+                    st.session_state.voice_messages.last()["transcript"] = transcript
                     voice_placeholder.markdown(
                         build_voice_messages_html(
                             st.session_state.voice_messages, thinking=True
@@ -800,14 +1003,23 @@ with right_col:
                     scroll_chat_to_bottom()
 
                     reply = ""
+                    audio_chunks: List[bytes] = []
                     if transcript and transcript != "No se pudo transcribir el audio.":
-                        history_snapshot = list(st.session_state.messages)
+                        history_snapshot = st.session_state.messages.unsummarized(
+                            settings.history_max_messages
+                        )
                         st.session_state.messages.append(
                             {"role": "user", "content": transcript}
                         )
+                        synthesizer = None
+                        if settings.elevenlabs_api_key and settings.elevenlabs_voice_id:
+                            synthesizer = SentenceSynthesizer(
+                                lambda text: text_to_speech(settings, text),
+                                settings.tts_max_concurrency,
+                            )
                         with st.spinner("Pensando..."):
                             try:
-                                reply = run_chat(
+                                for token in run_chat_stream(
                                     graph,
                                     st.session_state.login_user,
                                     transcript,
@@ -815,41 +1027,62 @@ with right_col:
                                     system_prompt=build_system_prompt(
                                         st.session_state.mode
                                     ),
-                                )
+                                    history_summary=(
+                                        st.session_state.messages.summary.text
+                                    ),
+                                    session_id=st.session_state.messages.session_id,
+                                ):
+                                    reply += token
+                                    voice_placeholder.markdown(
+                                        build_voice_messages_html(
+                                            st.session_state.voice_messages,
+                                            pending={
+                                                "role": "assistant",
+                                                "transcript": reply,
+                                                "audio_id": "",
+                                            },
+                                        ),
+                                        unsafe_allow_html=True,
+                                    )
+                                    if synthesizer:
+                                        synthesizer.feed(token)
+                                        play_voice_chunks(
+                                            synthesizer.ready(), audio_chunks
+                                        )
                             except Exception as exc:
                                 reply = (
                                     "No se pudo generar la respuesta. "
                                     f"Detalles: {exc}"
                                 )
+                                if synthesizer:
+                                    synthesizer.cancel()
+                                    synthesizer.feed(reply)
+                        reply = reply.strip()
                         st.session_state.messages.append(
                             {"role": "assistant", "content": reply}
                         )
-
-                    if reply:
-                        assistant_audio_uri = ""
-                        if settings.elevenlabs_api_key and settings.elevenlabs_voice_id:
+                        update_history_summary()
+                        if synthesizer:
                             with st.spinner("Generando audio..."):
-                                try:
-                                    audio_reply, mime = text_to_speech(
-                                        settings, reply
-                                    )
-                                    assistant_audio_uri = audio_to_data_uri(
-                                        audio_reply, mime
-                                    )
-                                except Exception as exc:
-                                    st.error(
-                                        "No se pudo generar el audio del asistente. "
-                                        f"Detalles: {exc}"
-                                    )
+                                play_voice_chunks(synthesizer.close(), audio_chunks)
 
-                        for msg in st.session_state.voice_messages:
+                    if reply:
+                        assistant_audio_id = ""
+                        if audio_chunks:
+                            # Los fragmentos MP3 se concatenan para repetir la respuesta
+                            # completa; ya se reprodujeron en streaming.
+                            assistant_audio_id = store_audio(
+                                b"".join(audio_chunks), "audio/mpeg"
+                            )
+
+                        for msg in st.session_state.voice_messages.hot():
                             msg["autoplay"] = False
                         st.session_state.voice_messages.append(
                             {
                                 "role": "assistant",
                                 "transcript": reply,
-                                "audio_uri": assistant_audio_uri,
-                                "autoplay": bool(assistant_audio_uri),
+                                "audio_id": assistant_audio_id,
+                                "autoplay": False,
                             }
                         )
                         voice_placeholder.markdown(
@@ -858,7 +1091,10 @@ with right_col:
                         )
                         scroll_chat_to_bottom()
     else:
-        _, graph = get_runtime()
+        settings, graph = get_runtime()
+        from backend.memory_agent import run_chat_stream
+
+        render_load_older_button(st.session_state.messages)
         chat_placeholder = st.empty()
         chat_placeholder.markdown(
             build_messages_html(st.session_state.messages),
@@ -882,7 +1118,9 @@ with right_col:
 
         if send_clicked and user_text.strip():
             user_message = user_text.strip()
-            history_snapshot = list(st.session_state.messages)
+            history_snapshot = st.session_state.messages.unsummarized(
+                settings.history_max_messages
+            )
             st.session_state.messages.append(
                 {"role": "user", "content": user_message}
             )
@@ -891,21 +1129,34 @@ with right_col:
                 unsafe_allow_html=True,
             )
             scroll_chat_to_bottom()
+            reply = ""
             with st.spinner("Pensando..."):
                 try:
-                    reply = run_chat(
+                    for token in run_chat_stream(
                         graph,
                         st.session_state.login_user,
                         user_message,
                         history_snapshot,
                         system_prompt=build_system_prompt(st.session_state.mode),
-                    )
+                        history_summary=st.session_state.messages.summary.text,
+                        session_id=st.session_state.messages.session_id,
+                    ):
+                        reply += token
+                        chat_placeholder.markdown(
+                            build_messages_html(
+                                st.session_state.messages,
+                                pending={"role": "assistant", "content": reply},
+                            ),
+                            unsafe_allow_html=True,
+                        )
                 except Exception as exc:
                     reply = (
                         "No se pudo generar la respuesta. "
                         f"Detalles: {exc}"
                     )
+            reply = reply.strip()
             st.session_state.messages.append({"role": "assistant", "content": reply})
+            update_history_summary()
             chat_placeholder.markdown(
                 build_messages_html(st.session_state.messages),
                 unsafe_allow_html=True,
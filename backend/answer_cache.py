@@ -0,0 +1,143 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+import hashlib
+import itertools
+import threading
+import time
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from backend.metrics import record_cache
+from backend.vector_math import as_matrix, normalize_rows
+
+
+class MemoryVersions:
+    def __init__(self) -> None:
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, tenant_id: str) -> int:
+        with self._lock:
+            return self._versions.get(tenant_id, 0)
+
+    def bump(self, tenant_id: str) -> int:
+        with self._lock:
+            version = self._versions.get(tenant_id, 0) + 1
+            self._versions[tenant_id] = version
+            return version
+
+
+def answer_scope(
+    system_prompt: str, last_exchange: Sequence[Dict[str, str]] = ()
+) -> str:
+    # La respuesta depende tambien del turno anterior ("y en Madrid?"), asi
+    # que forma parte de la clave junto con el prompt de sistema.
+    digest = hashlib.sha256((system_prompt or "").encode("utf-8"))
+    for message in last_exchange:
+        digest.update(b"\x00")
+        digest.update(message.get("role", "").encode("utf-8"))
+        digest.update(b"\x00")
+        digest.update(message.get("content", "").encode("utf-8"))
+    return digest.hexdigest()
+
+
+@dataclass
+class _CachedAnswer:
+    tenant_id: str
+    scope: str
+    vector: np.ndarray
+    answer: str
+    version: int
+    created_at: float
+
+
+class SemanticAnswerCache:
+    def __init__(
+        self,
+        versions: MemoryVersions,
+        similarity_threshold: float,
+        ttl_seconds: float,
+        max_entries: int,
+    ) -> None:
+        self._versions = versions
+        self._similarity_threshold = similarity_threshold
+        self._ttl_seconds = ttl_seconds
+        self._max_entries = max(1, max_entries)
+        self._lru: "OrderedDict[int, _CachedAnswer]" = OrderedDict()
+        self._by_tenant: Dict[str, Dict[int, _CachedAnswer]] = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _remove(self, entry_id: int) -> None:
+        entry = self._lru.pop(entry_id)
+        tenant_entries = self._by_tenant[entry.tenant_id]
+        del tenant_entries[entry_id]
+        if not tenant_entries:
+            del self._by_tenant[entry.tenant_id]
+
+    def _live_entries(self, tenant_id: str, scope: str) -> List[int]:
+        # Las respuestas caducadas o anteriores al ultimo guardado de memoria
+        # del tenant ya no son validas y se descartan al encontrarlas.
+        version = self._versions.get(tenant_id)
+        expires_before = time.monotonic() - self._ttl_seconds
+        live = []
+        for entry_id, entry in list(self._by_tenant.get(tenant_id, {}).items()):
+            if entry.version != version or entry.created_at < expires_before:
+                self._remove(entry_id)
+            elif entry.scope == scope:
+                live.append(entry_id)
+        return live
+
+    def get(
+        self, tenant_id: str, scope: str, query_vector: List[float]
+    ) -> Optional[str]:
+        with self._lock:
+            live = self._live_entries(tenant_id, scope)
+            answer = None
+            if live:
+                matrix = np.stack([self._lru[entry_id].vector for entry_id in live])
+                query = normalize_rows(as_matrix([query_vector]))[0]
+                scores = matrix @ query
+                best = int(np.argmax(scores))
+                if float(scores[best]) >= self._similarity_threshold:
+                    self._lru.move_to_end(live[best])
+                    answer = self._lru[live[best]].answer
+            if answer is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        record_cache("answer", answer is not None)
+        return answer
+
+    def put(
+        self, tenant_id: str, scope: str, query_vector: List[float], answer: str
+    ) -> None:
+        if not answer:
+            return
+        entry = _CachedAnswer(
+            tenant_id=tenant_id,
+            scope=scope,
+            vector=normalize_rows(as_matrix([query_vector]))[0],
+            answer=answer,
+            version=self._versions.get(tenant_id),
+            created_at=time.monotonic(),
+        )
+        with self._lock:
+            entry_id = next(self._ids)
+            self._lru[entry_id] = entry
+            self._by_tenant.setdefault(tenant_id, {})[entry_id] = entry
+            while len(self._lru) > self._max_entries:
+                self._remove(next(iter(self._lru)))
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._lru),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -1,7 +1,20 @@
+from contextlib import contextmanager
+import hashlib
+import hmac
+import os
+import threading
+import time
+from typing import Dict, Iterator, Optional
+
 import psycopg2
 from psycopg2 import sql
+from psycopg2.pool import PoolError, ThreadedConnectionPool
 
 from backend.config import Settings
+from backend.metrics import record_cache, timed
+
+
+_RETRYABLE_ERRORS = (psycopg2.OperationalError, psycopg2.InterfaceError)
 
 
 def is_auth_configured(settings: Settings) -> bool:
@@ -15,7 +28,98 @@ def _table_identifier(table_name: str) -> sql.Identifier:
     return sql.Identifier(*parts)
 
 
-def verify_user_credentials(username: str, password: str, settings: Settings) -> bool:
+class AuthConnectionPool:
+    def __init__(
+        self, db_url: str, min_size: int, max_size: int, timeout: float = 10.0
+    ) -> None:
+        min_size = max(0, min_size)
+        max_size = max(1, min_size, max_size)
+        self._pool = ThreadedConnectionPool(min_size, max_size, db_url)
+        # ThreadedConnectionPool lanza PoolError al agotarse en lugar de
+        # esperar; el semaforo hace que los logins concurrentes hagan cola.
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._timeout = timeout
+
+    @contextmanager
+    def connection(self) -> Iterator["psycopg2.extensions.connection"]:
+        if not self._slots.acquire(timeout=self._timeout):
+            raise PoolError("No hay conexiones libres en el pool de autenticacion.")
+        try:
+            conn = self._pool.getconn()
+            if conn.closed:
+                # Conexion cerrada por el servidor: se descarta y se abre otra.
+                self._pool.putconn(conn, close=True)
+                conn = self._pool.getconn()
+            broken = False
+            try:
+                yield conn
+            except _RETRYABLE_ERRORS:
+                broken = True
+                raise
+            finally:
+                self._pool.putconn(conn, close=broken or bool(conn.closed))
+        finally:
+            self._slots.release()
+
+    def close(self) -> None:
+        self._pool.closeall()
+
+
+class CredentialCache:
+    def __init__(self, ttl_seconds: float, max_entries: int = 1024) -> None:
+        self._ttl = ttl_seconds
+        self._max_entries = max(1, max_entries)
+        self._salt = os.urandom(16)
+        self._entries: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, username: str, password: str) -> str:
+        message = f"{username}\0{password}".encode("utf-8")
+        return hmac.new(self._salt, message, hashlib.sha256).hexdigest()
+
+    def contains(self, username: str, password: str) -> bool:
+        if self._ttl <= 0:
+            return False
+        key = self._key(username, password)
+        with self._lock:
+            expires_at = self._entries.get(key)
+            if expires_at is None:
+                return False
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return False
+            return True
+
+    def add(self, username: str, password: str) -> None:
+        if self._ttl <= 0:
+            return
+        key = self._key(username, password)
+        now = time.monotonic()
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = now + self._ttl
+            if len(self._entries) > self._max_entries:
+                for stale in [k for k, exp in self._entries.items() if exp < now]:
+                    del self._entries[stale]
+            while len(self._entries) > self._max_entries:
+                del self._entries[next(iter(self._entries))]
+
+
+def _query_credentials(conn, query, user_value: str, password: str) -> bool:
+    with conn:
+        with conn.cursor() as cur:
+            cur.execute(query, (user_value, password))
+            return cur.fetchone() is not None
+
+
+@timed("auth.login")
+def verify_user_credentials(
+    username: str,
+    password: str,
+    settings: Settings,
+    pool: Optional[AuthConnectionPool] = None,
+    cache: Optional[CredentialCache] = None,
+) -> bool:
     if not username or not password:
         return False
 
@@ -27,6 +131,12 @@ def verify_user_credentials(username: str, password: str, settings: Settings) ->
     if not user_value:
         return False
 
+    if cache is not None:
+        cached = cache.contains(user_value, password)
+        record_cache("credentials", cached)
+        if cached:
+            return True
+
     table = _table_identifier(settings.auth_users_table or "usuarios")
     user_col = sql.Identifier("username")
     pass_col = sql.Identifier("password_hash")
@@ -37,7 +147,18 @@ def verify_user_credentials(username: str, password: str, settings: Settings) ->
         "LIMIT 1"
     ).format(table=table, user_col=user_col, pass_col=pass_col)
 
-    with psycopg2.connect(db_url) as conn:
-        with conn.cursor() as cur:
-            cur.execute(query, (user_value, password))
-            return cur.fetchone() is not None
+    if pool is None:
+        with psycopg2.connect(db_url) as conn:
+            valid = _query_credentials(conn, query, user_value, password)
+    else:
+        try:
+            with pool.connection() as conn:
+                valid = _query_credentials(conn, query, user_value, password)
+        except _RETRYABLE_ERRORS:
+            # La conexion del pool estaba caida; se reintenta con una nueva.
+            with pool.connection() as conn:
+                valid = _query_credentials(conn, query, user_value, password)
+
+    if valid and cache is not None:
+        cache.add(user_value, password)
+    return valid
@@ -0,0 +1,34 @@
+import argparse
+from typing import List, Optional
+
+from backend.config import get_settings
+from backend.llm import get_embedding_model
+from backend.memory_store import get_memory_store
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Crea o actualiza la coleccion de memorias en Qdrant."
+    )
+    parser.add_argument(
+        "--vector-size",
+        type=int,
+        default=None,
+        help="Dimension de los vectores (por defecto se mide con el modelo).",
+    )
+    args = parser.parse_args(argv)
+
+    settings = get_settings()
+    vector_size = args.vector_size
+    if vector_size is None:
+        vector_size = len(get_embedding_model(settings).embed_query("dimension"))
+    created = get_memory_store(settings).ensure_collection(vector_size)
+    action = "creada" if created else "actualizada"
+    print(
+        f"Coleccion '{settings.qdrant_collection}' {action} "
+        f"(dimension {vector_size})."
+    )
+
+
+if __name__ == "__main__":
+    main()
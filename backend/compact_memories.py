@@ -0,0 +1,212 @@
+import argparse
+import json
+import os
+import time
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from backend.config import get_settings
+from backend.qdrant_store import PointData, QdrantStore
+from backend.vector_math import as_matrix, normalize_rows
+
+
+class RateLimiter:
+    def __init__(self, requests_per_second: float) -> None:
+        self._interval = 1.0 / requests_per_second if requests_per_second > 0 else 0.0
+        self._next_at = 0.0
+
+    def wait(self) -> None:
+        now = time.monotonic()
+        if now < self._next_at:
+            time.sleep(self._next_at - now)
+            now = self._next_at
+        self._next_at = now + self._interval
+
+
+def _scroll_all(
+    store: QdrantStore,
+    limiter: RateLimiter,
+    tenant_id: Optional[str],
+    batch_size: int,
+    with_vectors: bool,
+) -> Iterator[Any]:
+    offset = None
+    while True:
+        limiter.wait()
+        records, offset = store.scroll(tenant_id, batch_size, offset, with_vectors)
+        yield from records
+        if offset is None:
+            return
+
+
+def list_tenants(
+    store: QdrantStore, limiter: RateLimiter, batch_size: int
+) -> List[str]:
+    tenants = set()
+    for record in _scroll_all(store, limiter, None, batch_size, False):
+        tenant_id = (record.payload or {}).get("tenant_id")
+        if tenant_id:
+            tenants.add(tenant_id)
+    return sorted(tenants)
+
+
+def cluster_memories(vectors: np.ndarray, threshold: float) -> List[List[int]]:
+    # Agrupamiento por lider: cada punto sin asignar abre un cluster con los
+    # que superan el umbral contra el, asi no se encadenan parafrasis que solo
+    # se parecen de dos en dos. El lider es siempre el primer indice.
+    matrix = normalize_rows(vectors)
+    unassigned = np.ones(len(matrix), dtype=bool)
+    clusters = []
+    for leader in range(len(matrix)):
+        if not unassigned[leader]:
+            continue
+        members = np.flatnonzero(unassigned & (matrix @ matrix[leader] >= threshold))
+        unassigned[members] = False
+        clusters.append([int(index) for index in members])
+    return clusters
+
+
+def merge_payloads(payloads: Sequence[Dict[str, Any]]) -> Dict[str, Any]:
+    merged = dict(payloads[0])
+    merged["importance"] = max(payload.get("importance") or 3 for payload in payloads)
+    dates = [payload["created_at"] for payload in payloads if payload.get("created_at")]
+    if dates:
+        merged["created_at"] = min(dates)
+    return merged
+
+
+def _canonical_order(payload: Dict[str, Any]):
+    return (-(payload.get("importance") or 3), payload.get("created_at") or "")
+
+
+def _chunks(items: List[Any], size: int) -> Iterator[List[Any]]:
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+def compact_tenant(
+    store: QdrantStore,
+    limiter: RateLimiter,
+    tenant_id: str,
+    threshold: float,
+    batch_size: int,
+    dry_run: bool,
+) -> Dict[str, int]:
+    records = [
+        record
+        for record in _scroll_all(store, limiter, tenant_id, batch_size, True)
+        if record.vector
+    ]
+    # La memoria canonica de cada cluster es la mas importante y, a igualdad,
+    # la mas antigua; se ordena antes de agrupar para que sea el lider.
+    records.sort(key=lambda record: _canonical_order(record.payload or {}))
+    stats = {"points": len(records), "clusters": 0, "deleted": 0}
+    if len(records) < 2:
+        return stats
+
+    vectors = as_matrix([record.vector for record in records])
+    merges = []
+    for members in cluster_memories(vectors, threshold):
+        if len(members) < 2:
+            continue
+        leader = records[members[0]]
+        payload = merge_payloads([records[index].payload or {} for index in members])
+        canonical: PointData = (str(leader.id), list(leader.vector), payload)
+        duplicates = [str(records[index].id) for index in members[1:]]
+        merges.append((canonical, duplicates))
+        stats["clusters"] += 1
+        stats["deleted"] += len(duplicates)
+    if dry_run:
+        return stats
+
+    # Primero se actualiza la canonica y despues se borran las demas: si el
+    # proceso se corta, repetir el tenant vuelve a producir el mismo resultado.
+    for chunk in _chunks(merges, batch_size):
+        limiter.wait()
+        store.upsert_many([canonical for canonical, _ in chunk])
+        duplicates = [point_id for _, ids in chunk for point_id in ids]
+        for ids in _chunks(duplicates, batch_size):
+            limiter.wait()
+            store.delete_many(ids)
+    return stats
+
+
+def _load_state(path: str) -> Dict[str, Any]:
+    if not os.path.exists(path):
+        return {"completed": {}}
+    with open(path, "r", encoding="utf-8") as handle:
+        return json.load(handle)
+
+
+def _save_state(path: str, state: Dict[str, Any]) -> None:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as handle:
+        json.dump(state, handle, indent=2)
+    os.replace(tmp_path, path)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Fusiona memorias casi duplicadas de cada usuario en Qdrant."
+    )
+    parser.add_argument(
+        "--tenant",
+        action="append",
+        help="Usuario a compactar (repetible; por defecto todos).",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=None,
+        help="Similitud coseno minima para fusionar (por defecto la de dedup).",
+    )
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument(
+        "--requests-per-second",
+        type=float,
+        default=5.0,
+        help="Limite de peticiones a Qdrant (0 sin limite).",
+    )
+    parser.add_argument(
+        "--state",
+        default="compaction_state.json",
+        help="Archivo de progreso para reanudar una ejecucion interrumpida.",
+    )
+    parser.add_argument(
+        "--restart", action="store_true", help="Ignora el progreso guardado."
+    )
+    parser.add_argument(
+        "--dry-run", action="store_true", help="Solo informa, no modifica nada."
+    )
+    args = parser.parse_args(argv)
+
+    settings = get_settings()
+    if settings.vector_store != "qdrant":
+        print("La compactacion solo esta disponible con VECTOR_STORE=qdrant.")
+        return 1
+    threshold = args.threshold or settings.memory_dedup_threshold
+    store = QdrantStore(settings)
+    limiter = RateLimiter(args.requests_per_second)
+    state = {"completed": {}} if args.restart else _load_state(args.state)
+
+    tenants = args.tenant or list_tenants(store, limiter, args.batch_size)
+    for tenant_id in tenants:
+        if tenant_id in state["completed"]:
+            print(f"{tenant_id}: ya compactado, se omite.")
+            continue
+        stats = compact_tenant(
+            store, limiter, tenant_id, threshold, args.batch_size, args.dry_run
+        )
+        print(
+            f"{tenant_id}: {stats['points']} memorias, {stats['clusters']} grupos, "
+            f"{stats['deleted']} eliminadas{' (simulado)' if args.dry_run else ''}."
+        )
+        if not args.dry_run:
+            state["completed"][tenant_id] = stats
+            _save_state(args.state, state)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -10,34 +10,94 @@ load_dotenv()
 
 @dataclass(frozen=True)
 class Settings:
+    vector_store: str
+    local_store_dir: Optional[str]
     qdrant_url: str
     qdrant_api_key: Optional[str]
     qdrant_collection: str
+    qdrant_hnsw_m: int
+    qdrant_hnsw_ef_construct: int
+    qdrant_quantization: bool
     database_url: Optional[str]
     auth_users_table: Optional[str]
+    auth_pool_min: int
+    auth_pool_max: int
+    auth_pool_timeout_seconds: float
+    auth_cache_ttl_seconds: float
     llm_provider: str
     llm_api_key: Optional[str]
     openai_api_key: Optional[str]
     chat_model: str
     embedding_model: str
+    embedding_cache_size: int
+    embedding_cache_path: Optional[str]
     ollama_base_url: str
+    ollama_keep_alive: Optional[str]
+    warmup_enabled: bool
     memory_top_k: int
     memory_dedup_threshold: float
+    memory_oversample: int
+    memory_min_score: float
+    memory_similarity_weight: float
+    memory_importance_weight: float
+    memory_recency_weight: float
+    memory_recency_half_life_days: float
+    memory_mmr_lambda: float
+    memory_gate_enabled: bool
+    memory_gate_min_words: int
+    memory_gate_skip_questions: bool
+    memory_gate_similarity: float
+    answer_cache_enabled: bool
+    answer_cache_similarity: float
+    answer_cache_ttl_seconds: float
+    answer_cache_size: int
+    retrieval_reuse_enabled: bool
+    retrieval_reuse_similarity: float
+    retrieval_reuse_sessions: int
     history_max_messages: int
+    context_token_budget: int
+    history_token_budget: int
+    summary_max_tokens: int
+    session_hot_messages: int
+    session_spill_dir: str
+    memory_workers: int
+    memory_queue_size: int
+    memory_write_batch_size: int
+    memory_write_max_delay_seconds: float
     elevenlabs_api_key: Optional[str]
     elevenlabs_voice_id: Optional[str]
     elevenlabs_tts_model: str
     elevenlabs_stt_model: str
     elevenlabs_output_format: Optional[str]
+    elevenlabs_base_url: str
+    elevenlabs_max_retries: int
+    elevenlabs_backoff_seconds: float
+    elevenlabs_pool_size: int
+    tts_max_concurrency: int
+    media_store_dir: str
+    media_store_max_bytes: int
+    metrics_enabled: bool
+    metrics_port: Optional[int]
+    metrics_file: Optional[str]
+    metrics_file_interval_seconds: float
 
 
 def get_settings() -> Settings:
+    vector_store = os.getenv("VECTOR_STORE", "qdrant").lower().strip()
+    local_store_dir = os.getenv("LOCAL_STORE_DIR") or None
     qdrant_url = os.getenv("QDRANT_URL")
     qdrant_api_key = os.getenv("QDRANT_API_KEY") or None
     qdrant_collection = os.getenv("QDRANT_COLLECTION")
+    qdrant_hnsw_m = int(os.getenv("QDRANT_HNSW_M", "16"))
+    qdrant_hnsw_ef_construct = int(os.getenv("QDRANT_HNSW_EF_CONSTRUCT", "100"))
+    qdrant_quantization = os.getenv("QDRANT_QUANTIZATION", "true").lower() == "true"
 
     database_url = os.getenv("DATABASE_URL")
     auth_users_table = os.getenv("AUTH_USERS_TABLE")
+    auth_pool_min = int(os.getenv("AUTH_POOL_MIN", "1"))
+    auth_pool_max = int(os.getenv("AUTH_POOL_MAX", "10"))
+    auth_pool_timeout_seconds = float(os.getenv("AUTH_POOL_TIMEOUT_SECONDS", "10"))
+    auth_cache_ttl_seconds = float(os.getenv("AUTH_CACHE_TTL_SECONDS", "60"))
 
     llm_provider = os.getenv("LLM_PROVIDER", "ollama").lower().strip()
     llm_api_key = os.getenv("LLM_API_KEY") or None
@@ -45,36 +105,145 @@ def get_settings() -> Settings:
 
     chat_model = os.getenv("CHAT_MODEL")
     embedding_model = os.getenv("EMBEDDING_MODEL")
+    embedding_cache_size = int(os.getenv("EMBEDDING_CACHE_SIZE", "1024"))
+    embedding_cache_path = os.getenv("EMBEDDING_CACHE_PATH") or None
     ollama_base_url = os.getenv("OLLAMA_HOST")
+    ollama_keep_alive = os.getenv("OLLAMA_KEEP_ALIVE", "30m") or None
+    warmup_enabled = os.getenv("WARMUP_ENABLED", "true").lower() == "true"
 
     memory_top_k = int(os.getenv("MEMORY_TOP_K", "5"))
     memory_dedup_threshold = float(os.getenv("MEMORY_DEDUP_THRESHOLD", "0.90"))
-    history_max_messages = int(os.getenv("HISTORY_MAX_MESSAGES", "8"))
+    memory_oversample = int(os.getenv("MEMORY_OVERSAMPLE", "3"))
+    memory_min_score = float(os.getenv("MEMORY_MIN_SCORE", "0.3"))
+    memory_similarity_weight = float(os.getenv("MEMORY_SIMILARITY_WEIGHT", "0.7"))
+    memory_importance_weight = float(os.getenv("MEMORY_IMPORTANCE_WEIGHT", "0.2"))
+    memory_recency_weight = float(os.getenv("MEMORY_RECENCY_WEIGHT", "0.1"))
+    memory_recency_half_life_days = float(
+        os.getenv("MEMORY_RECENCY_HALF_LIFE_DAYS", "30")
+    )
+    memory_mmr_lambda = float(os.getenv("MEMORY_MMR_LAMBDA", "0.7"))
+    memory_gate_enabled = os.getenv("MEMORY_GATE_ENABLED", "true").lower() == "true"
+    memory_gate_min_words = int(os.getenv("MEMORY_GATE_MIN_WORDS", "0"))
+    memory_gate_skip_questions = (
+        os.getenv("MEMORY_GATE_SKIP_QUESTIONS", "false").lower() == "true"
+    )
+    memory_gate_similarity = float(os.getenv("MEMORY_GATE_SIMILARITY", "0"))
+    answer_cache_enabled = os.getenv("ANSWER_CACHE_ENABLED", "false").lower() == "true"
+    answer_cache_similarity = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.95"))
+    answer_cache_ttl_seconds = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "600"))
+    answer_cache_size = int(os.getenv("ANSWER_CACHE_SIZE", "512"))
+    retrieval_reuse_enabled = (
+        os.getenv("RETRIEVAL_REUSE_ENABLED", "true").lower() == "true"
+    )
+    retrieval_reuse_similarity = float(
+        os.getenv("RETRIEVAL_REUSE_SIMILARITY", "0.9")
+    )
+    retrieval_reuse_sessions = int(os.getenv("RETRIEVAL_REUSE_SESSIONS", "1000"))
+    history_max_messages = int(os.getenv("HISTORY_MAX_MESSAGES", "40"))
+    context_token_budget = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))
+    history_token_budget = int(os.getenv("HISTORY_TOKEN_BUDGET", "1500"))
+    summary_max_tokens = int(os.getenv("SUMMARY_MAX_TOKENS", "300"))
+    session_hot_messages = int(os.getenv("SESSION_HOT_MESSAGES", "60"))
+    session_spill_dir = os.getenv("SESSION_SPILL_DIR", ".session_history")
+    memory_workers = int(os.getenv("MEMORY_WORKERS", "2"))
+    memory_queue_size = int(os.getenv("MEMORY_QUEUE_SIZE", "100"))
+    memory_write_batch_size = int(os.getenv("MEMORY_WRITE_BATCH_SIZE", "16"))
+    memory_write_max_delay_seconds = float(
+        os.getenv("MEMORY_WRITE_MAX_DELAY_SECONDS", "2.0")
+    )
 
     elevenlabs_api_key = os.getenv("ELEVENLABS_API_KEY") or None
     elevenlabs_voice_id = os.getenv("ELEVENLABS_VOICE_ID") or None
     elevenlabs_tts_model = os.getenv("ELEVENLABS_TTS_MODEL")
     elevenlabs_stt_model = os.getenv("ELEVENLABS_STT_MODEL")
     elevenlabs_output_format = os.getenv("ELEVENLABS_OUTPUT_FORMAT") or None
+    elevenlabs_base_url = os.getenv(
+        "ELEVENLABS_BASE_URL", "https://api.elevenlabs.io"
+    ).rstrip("/")
+    elevenlabs_max_retries = int(os.getenv("ELEVENLABS_MAX_RETRIES", "3"))
+    elevenlabs_backoff_seconds = float(os.getenv("ELEVENLABS_BACKOFF_SECONDS", "0.5"))
+    elevenlabs_pool_size = int(os.getenv("ELEVENLABS_POOL_SIZE", "10"))
+    tts_max_concurrency = int(os.getenv("TTS_MAX_CONCURRENCY", "3"))
+    media_store_dir = os.getenv("MEDIA_STORE_DIR", ".media_cache")
+    media_store_max_bytes = int(os.getenv("MEDIA_STORE_MAX_MB", "256")) * 1024 * 1024
+
+    metrics_enabled = os.getenv("METRICS_ENABLED", "false").lower() == "true"
+    metrics_port_raw = os.getenv("METRICS_PORT")
+    metrics_port = int(metrics_port_raw) if metrics_port_raw else None
+    metrics_file = os.getenv("METRICS_FILE") or None
+    metrics_file_interval_seconds = float(
+        os.getenv("METRICS_FILE_INTERVAL_SECONDS", "15")
+    )
 
     return Settings(
+        vector_store=vector_store,
+        local_store_dir=local_store_dir,
         qdrant_url=qdrant_url,
         qdrant_api_key=qdrant_api_key,
         qdrant_collection=qdrant_collection,
+        qdrant_hnsw_m=qdrant_hnsw_m,
+        qdrant_hnsw_ef_construct=qdrant_hnsw_ef_construct,
+        qdrant_quantization=qdrant_quantization,
         database_url=database_url,
         auth_users_table=auth_users_table,
+        auth_pool_min=auth_pool_min,
+        auth_pool_max=auth_pool_max,
+        auth_pool_timeout_seconds=auth_pool_timeout_seconds,
+        auth_cache_ttl_seconds=auth_cache_ttl_seconds,
         llm_provider=llm_provider,
         llm_api_key=llm_api_key,
         openai_api_key=openai_api_key,
         chat_model=chat_model,
         embedding_model=embedding_model,
+        embedding_cache_size=embedding_cache_size,
+        embedding_cache_path=embedding_cache_path,
         ollama_base_url=ollama_base_url,
+        ollama_keep_alive=ollama_keep_alive,
+        warmup_enabled=warmup_enabled,
         memory_top_k=memory_top_k,
         memory_dedup_threshold=memory_dedup_threshold,
+        memory_oversample=memory_oversample,
+        memory_min_score=memory_min_score,
+        memory_similarity_weight=memory_similarity_weight,
+        memory_importance_weight=memory_importance_weight,
+        memory_recency_weight=memory_recency_weight,
+        memory_recency_half_life_days=memory_recency_half_life_days,
+        memory_mmr_lambda=memory_mmr_lambda,
+        memory_gate_enabled=memory_gate_enabled,
+        memory_gate_min_words=memory_gate_min_words,
+        memory_gate_skip_questions=memory_gate_skip_questions,
+        memory_gate_similarity=memory_gate_similarity,
+        answer_cache_enabled=answer_cache_enabled,
+        answer_cache_similarity=answer_cache_similarity,
+        answer_cache_ttl_seconds=answer_cache_ttl_seconds,
+        answer_cache_size=answer_cache_size,
+        retrieval_reuse_enabled=retrieval_reuse_enabled,
+        retrieval_reuse_similarity=retrieval_reuse_similarity,
+        retrieval_reuse_sessions=retrieval_reuse_sessions,
         history_max_messages=history_max_messages,
+        context_token_budget=context_token_budget,
+        history_token_budget=history_token_budget,
+        summary_max_tokens=summary_max_tokens,
+        session_hot_messages=session_hot_messages,
+        session_spill_dir=session_spill_dir,
+        memory_workers=memory_workers,
+        memory_queue_size=memory_queue_size,
+        memory_write_batch_size=memory_write_batch_size,
+        memory_write_max_delay_seconds=memory_write_max_delay_seconds,
         elevenlabs_api_key=elevenlabs_api_key,
         elevenlabs_voice_id=elevenlabs_voice_id,
         elevenlabs_tts_model=elevenlabs_tts_model,
         elevenlabs_stt_model=elevenlabs_stt_model,
         elevenlabs_output_format=elevenlabs_output_format,
+        elevenlabs_base_url=elevenlabs_base_url,
+        elevenlabs_max_retries=elevenlabs_max_retries,
+        elevenlabs_backoff_seconds=elevenlabs_backoff_seconds,
+        elevenlabs_pool_size=elevenlabs_pool_size,
+        tts_max_concurrency=tts_max_concurrency,
+        media_store_dir=media_store_dir,
+        media_store_max_bytes=media_store_max_bytes,
+        metrics_enabled=metrics_enabled,
+        metrics_port=metrics_port,
+        metrics_file=metrics_file,
+        metrics_file_interval_seconds=metrics_file_interval_seconds,
     )
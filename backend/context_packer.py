@@ -0,0 +1,155 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
+import logging
+from typing import Callable, Dict, List, Optional
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from backend.config import Settings
+from backend.metrics import record_llm_usage, timed
+from backend.prompts import HISTORY_SUMMARY_SYSTEM_PROMPT, HISTORY_SUMMARY_USER_PROMPT
+from backend.session_history import RollingSummary
+
+
+logger = logging.getLogger(__name__)
+
+TokenCounter = Callable[[str], int]
+
+# Coste fijo aproximado por mensaje (rol y separadores de la plantilla de chat).
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def approximate_tokens(text: str) -> int:
+    return (len(text or "") + 3) // 4
+
+
+def get_token_counter(settings: Settings) -> TokenCounter:
+    # Ollama no expone un tokenizador local, asi que se estima por caracteres;
+    # con OpenAI se usa tiktoken si esta instalado.
+    if settings.llm_provider != "openai":
+        return approximate_tokens
+    try:
+        import tiktoken
+    except ImportError:
+        return approximate_tokens
+    try:
+        encoding = tiktoken.encoding_for_model(settings.chat_model)
+    except KeyError:
+        encoding = tiktoken.get_encoding("o200k_base")
+
+    @lru_cache(maxsize=4096)
+    def count_tokens(text: str) -> int:
+        return len(encoding.encode(text or "", disallowed_special=()))
+
+    return count_tokens
+
+
+def message_tokens(text: str, count_tokens: TokenCounter) -> int:
+    return count_tokens(text) + MESSAGE_OVERHEAD_TOKENS
+
+
+def fit_history(
+    history: List[Dict[str, str]],
+    budget: int,
+    count_tokens: TokenCounter,
+    max_messages: int = 0,
+) -> int:
+    # Devuelve el indice del mensaje mas antiguo que cabe: se recorren los
+    # turnos desde el mas reciente hasta agotar el presupuesto.
+    start = len(history)
+    used = 0
+    floor = max(0, len(history) - max_messages) if max_messages > 0 else 0
+    while start > floor:
+        cost = message_tokens(history[start - 1].get("content", ""), count_tokens)
+        if used + cost > budget:
+            break
+        used += cost
+        start -= 1
+    return start
+
+
+def _format_transcript(messages: List[Dict[str, str]]) -> str:
+    labels = {"user": "Usuario", "assistant": "Asistente"}
+    return "\n".join(
+        f"{labels.get(message.get('role'), 'Asistente')}: {message.get('content', '')}"
+        for message in messages
+    )
+
+
+class HistorySummarizer:
+    def __init__(
+        self,
+        chat_model,
+        count_tokens: TokenCounter,
+        history_token_budget: int,
+        max_messages: int,
+        summary_max_tokens: int,
+    ) -> None:
+        self._chat_model = chat_model
+        self._count_tokens = count_tokens
+        self._history_token_budget = history_token_budget
+        self._max_messages = max_messages
+        self._summary_max_tokens = summary_max_tokens
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="history-summary"
+        )
+
+    @timed("summarize_history")
+    def _summarize(self, previous: str, messages: List[Dict[str, str]]) -> str:
+        response = self._chat_model.invoke(
+            [
+                SystemMessage(content=HISTORY_SUMMARY_SYSTEM_PROMPT),
+                HumanMessage(
+                    content=HISTORY_SUMMARY_USER_PROMPT.format(
+                        max_words=max(20, self._summary_max_tokens * 3 // 4),
+                        summary=previous or "(vacio)",
+                        messages=_format_transcript(messages),
+                    )
+                ),
+            ]
+        )
+        record_llm_usage(response, "summarize_history")
+        text = str(response.content).strip()
+        tokens = self._count_tokens(text)
+        if tokens > self._summary_max_tokens:
+            # El modelo no siempre respeta el limite de palabras; se recorta
+            # para que el resumen no se coma el presupuesto del prompt.
+            text = text[: len(text) * self._summary_max_tokens // tokens].rstrip()
+        return text
+
+    def update(
+        self, summary: RollingSummary, uncovered: List[Dict[str, str]], offset: int
+    ) -> bool:
+        # Solo se resumen los turnos que ya no entran en la ventana reciente;
+        # el resumen previo se amplia en lugar de rehacerse desde cero.
+        if not summary.lock.acquire(blocking=False):
+            return False
+        try:
+            if summary.covered != offset:
+                return False
+            start = fit_history(
+                uncovered,
+                self._history_token_budget,
+                self._count_tokens,
+                self._max_messages,
+            )
+            if start == 0:
+                return False
+            summary.text = self._summarize(summary.text, uncovered[:start])
+            summary.covered += start
+            return True
+        except Exception:
+            logger.exception("No se pudo actualizar el resumen del historial.")
+            return False
+        finally:
+            summary.lock.release()
+
+    def submit(
+        self, summary: RollingSummary, uncovered: List[Dict[str, str]], offset: int
+    ) -> Optional[Future]:
+        if summary.lock.locked():
+            return None
+        return self._executor.submit(self.update, summary, uncovered, offset)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,144 @@
+from collections import OrderedDict
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+from typing import Dict, List, Optional
+
+from backend.metrics import record_cache
+
+
+def _normalize_key_text(text: str) -> str:
+    return re.sub(r"\s+", " ", text or "").strip()
+
+
+class CachedEmbeddings:
+    def __init__(
+        self,
+        model,
+        provider: str,
+        model_name: str,
+        max_entries: int,
+        path: Optional[str] = None,
+    ) -> None:
+        self._model = model
+        self._namespace = f"{provider}\0{model_name}"
+        self._max_entries = max(1, max_entries)
+        self._entries: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self.hits = 0
+        self.misses = 0
+        if path:
+            self._open_db(path)
+
+    def _key(self, text: str) -> str:
+        raw = f"{self._namespace}\0{_normalize_key_text(text)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _open_db(self, path: str) -> None:
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings "
+            "(key TEXT PRIMARY KEY, vector TEXT NOT NULL)"
+        )
+        rows = self._db.execute(
+            "SELECT key, vector FROM embeddings ORDER BY rowid DESC LIMIT ?",
+            (self._max_entries,),
+        ).fetchall()
+        for key, vector in reversed(rows):
+            self._entries[key] = json.loads(vector)
+
+    @property
+    def model(self):
+        return self._model
+
+    def _get(self, key: str) -> Optional[List[float]]:
+        vector = self._entries.get(key)
+        if vector is None:
+            self.misses += 1
+            record_cache("embedding", False)
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        record_cache("embedding", True)
+        return vector
+
+    def _put(self, key: str, vector: List[float]) -> None:
+        self._entries[key] = vector
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+        if self._db is None:
+            return
+        # INSERT OR REPLACE renueva el rowid, asi que el archivo conserva
+        # las entradas mas recientes con el mismo limite que la memoria.
+        self._db.execute(
+            "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+            (key, json.dumps(vector)),
+        )
+        self._db.execute(
+            "DELETE FROM embeddings WHERE rowid <= "
+            "(SELECT MAX(rowid) FROM embeddings) - ?",
+            (self._max_entries,),
+        )
+        self._db.commit()
+
+    def embed_query(self, text: str) -> List[float]:
+        key = self._key(text)
+        with self._lock:
+            cached = self._get(key)
+        if cached is not None:
+            return cached
+        vector = self._model.embed_query(text)
+        with self._lock:
+            self._put(key, vector)
+        return vector
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self._key(text) for text in texts]
+        vectors: List[Optional[List[float]]] = []
+        with self._lock:
+            for key in keys:
+                vectors.append(self._get(key))
+        missing = [index for index, vector in enumerate(vectors) if vector is None]
+        if missing:
+            computed = self._model.embed_documents([texts[i] for i in missing])
+            with self._lock:
+                for index, vector in zip(missing, computed):
+                    vectors[index] = vector
+                    self._put(keys[index], vector)
+        return vectors
+
+    async def aembed_query(self, text: str) -> List[float]:
+        key = self._key(text)
+        with self._lock:
+            cached = self._get(key)
+        if cached is not None:
+            return cached
+        vector = await self._model.aembed_query(text)
+        with self._lock:
+            self._put(key, vector)
+        return vector
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self._key(text) for text in texts]
+        with self._lock:
+            vectors = [self._get(key) for key in keys]
+        missing = [index for index, vector in enumerate(vectors) if vector is None]
+        if missing:
+            computed = await self._model.aembed_documents([texts[i] for i in missing])
+            with self._lock:
+                for index, vector in zip(missing, computed):
+                    vectors[index] = vector
+                    self._put(keys[index], vector)
+        return vectors
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+            }
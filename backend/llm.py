@@ -1,21 +1,59 @@
+import re
+from typing import Optional
+
 from langchain_ollama import ChatOllama
 from langchain_ollama import OllamaEmbeddings
 from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 
 from backend.config import Settings
+from backend.embedding_cache import CachedEmbeddings
+
+
+_DURATION_UNITS = {"": 1, "s": 1, "m": 60, "h": 3600}
+
+
+def _keep_alive_seconds(value: Optional[str]) -> Optional[int]:
+    # OllamaEmbeddings solo acepta segundos enteros; ChatOllama tambien
+    # acepta duraciones como "30m", pero se usa el mismo valor en ambos.
+    if not value:
+        return None
+    match = re.fullmatch(r"\s*(-?\d+)\s*([smh]?)\s*", value.lower())
+    if not match:
+        raise ValueError(f"OLLAMA_KEEP_ALIVE invalido: {value!r}")
+    amount, unit = match.groups()
+    return int(amount) * _DURATION_UNITS[unit]
 
 
 def get_chat_model(settings: Settings):
     if settings.llm_provider == "openai":
         api_key = settings.llm_api_key or settings.openai_api_key
         return ChatOpenAI(model=settings.chat_model, openai_api_key=api_key)
-    return ChatOllama(model=settings.chat_model, base_url=settings.ollama_base_url)
+    return ChatOllama(
+        model=settings.chat_model,
+        base_url=settings.ollama_base_url,
+        keep_alive=_keep_alive_seconds(settings.ollama_keep_alive),
+    )
 
 
-def get_embedding_model(settings: Settings):
+def _build_embedding_model(settings: Settings):
     if settings.llm_provider == "openai":
         api_key = settings.llm_api_key or settings.openai_api_key
         return OpenAIEmbeddings(model=settings.embedding_model, openai_api_key=api_key)
     return OllamaEmbeddings(
-        model=settings.embedding_model, base_url=settings.ollama_base_url
+        model=settings.embedding_model,
+        base_url=settings.ollama_base_url,
+        keep_alive=_keep_alive_seconds(settings.ollama_keep_alive),
+    )
+
+
+def get_embedding_model(settings: Settings):
+    model = _build_embedding_model(settings)
+    if settings.embedding_cache_size <= 0:
+        return model
+    return CachedEmbeddings(
+        model,
+        settings.llm_provider,
+        settings.embedding_model,
+        settings.embedding_cache_size,
+        settings.embedding_cache_path,
     )
@@ -0,0 +1,254 @@
+from dataclasses import dataclass
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from backend.metrics import timed
+from backend.qdrant_store import PointData
+
+
+@dataclass
+class LocalPoint:
+    id: str
+    score: float
+    payload: Dict[str, Any]
+    vector: Optional[List[float]] = None
+
+
+class _TenantIndex:
+    def __init__(self, dim: int, capacity: int = 64) -> None:
+        self.matrix = np.zeros((capacity, dim), dtype=np.float32)
+        self.size = 0
+        self.ids: List[str] = []
+        self.payloads: List[Dict[str, Any]] = []
+        self.positions: Dict[str, int] = {}
+
+    def upsert(self, point_id: str, vector: np.ndarray, payload: dict) -> None:
+        row = self.positions.get(point_id)
+        if row is None:
+            if self.size == self.matrix.shape[0]:
+                grown = np.zeros(
+                    (max(64, 2 * self.size), self.matrix.shape[1]), dtype=np.float32
+                )
+                grown[: self.size] = self.matrix[: self.size]
+                self.matrix = grown
+            elif not self.matrix.flags.writeable:
+                # Copia en escritura del archivo mapeado en memoria.
+                self.matrix = np.array(self.matrix)
+            row = self.size
+            self.size += 1
+            self.ids.append(point_id)
+            self.payloads.append(payload)
+            self.positions[point_id] = row
+        else:
+            if not self.matrix.flags.writeable:
+                self.matrix = np.array(self.matrix)
+            self.payloads[row] = payload
+        self.matrix[row] = vector
+
+    def top_k(
+        self, query: np.ndarray, limit: int, memory_type: Optional[str]
+    ) -> List[int]:
+        if self.size == 0 or limit <= 0:
+            return []
+        scores = self.matrix[: self.size] @ query
+        if memory_type is not None:
+            mask = np.fromiter(
+                (p.get("memory_type") == memory_type for p in self.payloads),
+                dtype=bool,
+                count=self.size,
+            )
+            scores = np.where(mask, scores, -np.inf)
+        limit = min(limit, self.size)
+        candidates = np.argpartition(-scores, limit - 1)[:limit]
+        ordered = candidates[np.argsort(-scores[candidates])]
+        return [int(row) for row in ordered if np.isfinite(scores[row])]
+
+
+def _normalize(vector: Sequence[float]) -> np.ndarray:
+    array = np.asarray(vector, dtype=np.float32)
+    norm = float(np.linalg.norm(array))
+    return array / norm if norm else array
+
+
+def _read_log(base: str) -> Optional[_TenantIndex]:
+    # Cada upsert anade una fila a .vec y una linea a .jsonl. Si el proceso
+    # se corto a mitad de una escritura se recortan ambos archivos a la
+    # ultima fila completa; si una id aparece varias veces vale la ultima.
+    with open(f"{base}.jsonl", "rb") as handle:
+        lines = [line for line in handle if line.endswith(b"\n")]
+    if not lines:
+        return None
+    records = [json.loads(line) for line in lines]
+    dim = records[0]["dim"]
+    row_bytes = 4 * dim
+    rows = min(len(records), os.path.getsize(f"{base}.vec") // row_bytes)
+    if rows == 0:
+        return None
+    records = records[:rows]
+    os.truncate(f"{base}.jsonl", sum(len(line) for line in lines[:rows]))
+    os.truncate(f"{base}.vec", rows * row_bytes)
+
+    matrix = np.memmap(f"{base}.vec", dtype=np.float32, mode="r", shape=(rows, dim))
+    latest = {record["id"]: row for row, record in enumerate(records)}
+    if len(latest) < rows:
+        keep = sorted(latest.values())
+        matrix = np.array(matrix[keep])
+        records = [records[row] for row in keep]
+    index = _TenantIndex(dim, capacity=0)
+    index.matrix = matrix
+    index.size = len(records)
+    index.ids = [record["id"] for record in records]
+    index.payloads = [record["payload"] for record in records]
+    index.positions = {point_id: row for row, point_id in enumerate(index.ids)}
+    return index
+
+
+class LocalVectorStore:
+    def __init__(self, path: Optional[str] = None) -> None:
+        self._path = path
+        self._tenants: Dict[str, _TenantIndex] = {}
+        self._lock = threading.Lock()
+        if path:
+            os.makedirs(path, exist_ok=True)
+
+    def ping(self) -> bool:
+        return True
+
+    def _tenant_file(self, tenant_id: str) -> str:
+        digest = hashlib.sha256(tenant_id.encode("utf-8")).hexdigest()[:24]
+        return os.path.join(self._path, digest)
+
+    def _load(self, tenant_id: str, dim: Optional[int]) -> Optional[_TenantIndex]:
+        index = self._tenants.get(tenant_id)
+        if index is not None:
+            return index
+        base = self._tenant_file(tenant_id) if self._path else None
+        if base and os.path.exists(f"{base}.jsonl"):
+            index = _read_log(base)
+        if index is None:
+            if dim is None:
+                return None
+            index = _TenantIndex(dim)
+        self._tenants[tenant_id] = index
+        return index
+
+    def _append(
+        self, tenant_id: str, points: List[Tuple[str, np.ndarray, dict]]
+    ) -> None:
+        # Solo se escriben los puntos nuevos, asi el coste de un upsert no
+        # crece con el numero de memorias del usuario.
+        if not self._path:
+            return
+        base = self._tenant_file(tenant_id)
+        with open(f"{base}.vec", "ab") as handle:
+            for _, vector, _ in points:
+                handle.write(vector.tobytes())
+        with open(f"{base}.jsonl", "a", encoding="utf-8") as handle:
+            for point_id, vector, payload in points:
+                record = {"id": point_id, "dim": len(vector), "payload": payload}
+                handle.write(json.dumps(record) + "\n")
+
+    def _search(
+        self,
+        query_vector: List[float],
+        tenant_id: str,
+        limit: int,
+        memory_type: Optional[str],
+        with_vectors: bool,
+    ) -> List[LocalPoint]:
+        query = _normalize(query_vector)
+        with self._lock:
+            index = self._load(tenant_id, None)
+            if index is None:
+                return []
+            rows = index.top_k(query, limit, memory_type)
+            scores = index.matrix[rows] @ query if rows else []
+            return [
+                LocalPoint(
+                    id=index.ids[row],
+                    score=float(score),
+                    payload=index.payloads[row],
+                    vector=index.matrix[row].tolist() if with_vectors else None,
+                )
+                for row, score in zip(rows, scores)
+            ]
+
+    def ensure_collection(self, vector_size: int) -> bool:
+        return False
+
+    @timed("store.search")
+    def search(
+        self,
+        query_vector: List[float],
+        tenant_id: str,
+        limit: int,
+        with_vectors: bool = False,
+    ) -> List[LocalPoint]:
+        return self._search(query_vector, tenant_id, limit, None, with_vectors)
+
+    def search_similar(
+        self,
+        query_vector: List[float],
+        tenant_id: str,
+        memory_type: str,
+        limit: int,
+    ) -> List[LocalPoint]:
+        return self._search(query_vector, tenant_id, limit, memory_type, False)
+
+    def upsert(self, memory_id: str, vector: List[float], payload: dict) -> None:
+        self.upsert_many([(memory_id, vector, payload)])
+
+    @timed("store.upsert")
+    def upsert_many(self, points: Sequence[PointData]) -> None:
+        written: Dict[str, List[Tuple[str, np.ndarray, dict]]] = {}
+        with self._lock:
+            for memory_id, vector, payload in points:
+                tenant_id = payload.get("tenant_id", "")
+                index = self._load(tenant_id, len(vector))
+                normalized = _normalize(vector)
+                index.upsert(memory_id, normalized, payload)
+                written.setdefault(tenant_id, []).append(
+                    (memory_id, normalized, payload)
+                )
+            for tenant_id, tenant_points in written.items():
+                self._append(tenant_id, tenant_points)
+
+
+class AsyncLocalVectorStore:
+    def __init__(self, path: Optional[str] = None) -> None:
+        self._store = LocalVectorStore(path)
+
+    async def ping(self) -> bool:
+        return self._store.ping()
+
+    async def search(
+        self,
+        query_vector: List[float],
+        tenant_id: str,
+        limit: int,
+        with_vectors: bool = False,
+    ) -> List[LocalPoint]:
+        return self._store.search(query_vector, tenant_id, limit, with_vectors)
+
+    async def search_similar(
+        self,
+        query_vector: List[float],
+        tenant_id: str,
+        memory_type: str,
+        limit: int,
+    ) -> List[LocalPoint]:
+        return self._store.search_similar(query_vector, tenant_id, memory_type, limit)
+
+    async def upsert(self, memory_id: str, vector: List[float], payload: dict) -> None:
+        self._store.upsert(memory_id, vector, payload)
+
+    async def upsert_many(self, points: Sequence[PointData]) -> None:
+        self._store.upsert_many(points)
+
+    async def close(self) -> None:
+        return None
@@ -0,0 +1,84 @@
+from collections import OrderedDict
+import hashlib
+import os
+import threading
+from typing import Optional, Tuple
+
+
+_EXTENSIONS = {
+    "audio/mpeg": "mp3",
+    "audio/mp3": "mp3",
+    "audio/webm": "webm",
+    "audio/wav": "wav",
+    "audio/x-wav": "wav",
+    "audio/ogg": "ogg",
+}
+_MIME_TYPES = {
+    "mp3": "audio/mpeg",
+    "webm": "audio/webm",
+    "wav": "audio/wav",
+    "ogg": "audio/ogg",
+}
+
+
+class MediaStore:
+    def __init__(self, root: str, max_bytes: int) -> None:
+        self._root = root
+        self._max_bytes = max(1, max_bytes)
+        self._lock = threading.Lock()
+        self._sizes: "OrderedDict[str, int]" = OrderedDict()
+        self._total = 0
+        os.makedirs(root, exist_ok=True)
+        entries = []
+        for name in os.listdir(root):
+            path = os.path.join(root, name)
+            if os.path.isfile(path):
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, name, stat.st_size))
+        for _, name, size in sorted(entries):
+            self._sizes[name] = size
+            self._total += size
+        with self._lock:
+            self._evict()
+
+    def _path(self, media_id: str) -> str:
+        return os.path.join(self._root, os.path.basename(media_id))
+
+    def put(self, data: bytes, mime_type: Optional[str]) -> str:
+        extension = _EXTENSIONS.get((mime_type or "").split(";")[0], "bin")
+        media_id = f"{hashlib.sha256(data).hexdigest()}.{extension}"
+        with self._lock:
+            if media_id in self._sizes:
+                self._sizes.move_to_end(media_id)
+                return media_id
+            tmp_path = f"{self._path(media_id)}.tmp"
+            with open(tmp_path, "wb") as handle:
+                handle.write(data)
+            os.replace(tmp_path, self._path(media_id))
+            self._sizes[media_id] = len(data)
+            self._total += len(data)
+            self._evict()
+        return media_id
+
+    def get(self, media_id: str) -> Optional[Tuple[bytes, str]]:
+        with self._lock:
+            if media_id not in self._sizes:
+                return None
+            self._sizes.move_to_end(media_id)
+        try:
+            with open(self._path(media_id), "rb") as handle:
+                data = handle.read()
+        except FileNotFoundError:
+            return None
+        extension = media_id.rsplit(".", 1)[-1]
+        return data, _MIME_TYPES.get(extension, "application/octet-stream")
+
+    def _evict(self) -> None:
+        # Se conserva siempre el clip mas reciente aunque supere el limite.
+        while self._total > self._max_bytes and len(self._sizes) > 1:
+            media_id, size = self._sizes.popitem(last=False)
+            self._total -= size
+            try:
+                os.remove(self._path(media_id))
+            except FileNotFoundError:
+                pass
@@ -1,33 +1,65 @@
+import asyncio
+import atexit
+from concurrent.futures import Future, ThreadPoolExecutor
+import contextvars
+import logging
 import re
-from typing import Any, Dict, List, Optional, TypedDict
+import threading
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Set, TypedDict
 
 from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
-from langgraph.graph import END, StateGraph
+from langgraph.graph import END, START, StateGraph
 
+from backend.answer_cache import MemoryVersions, SemanticAnswerCache, answer_scope
 from backend.config import Settings
+from backend.context_packer import (
+    TokenCounter,
+    fit_history,
+    get_token_counter,
+    message_tokens,
+)
 from backend.llm import get_chat_model, get_embedding_model
-from backend.memory_schema import MemoryDecision
+from backend.memory_gate import TRIVIAL_MESSAGE_PROTOTYPES, MemoryGate
+from backend.memory_schema import MemoryCandidate, MemoryDecision
+from backend.memory_store import get_async_memory_store, get_memory_store
+from backend.memory_worker import AsyncMemoryWorkerPool, MemoryWorkerPool
+from backend.metrics import record_llm_usage, timed
+from backend.memory_writer import MemoryWriteBuffer, PendingMemory
 from backend.prompts import (
     MEMORY_DECIDER_SYSTEM_PROMPT,
     MEMORY_DECIDER_USER_PROMPT,
     SYSTEM_CHAT_PROMPT,
 )
-from backend.qdrant_store import QdrantStore
+from backend.reranker import rerank_memories
+from backend.retrieval_cache import SessionRetrievalCache
 from backend.utils import extract_json, new_uuid, trim_chat_history, utc_now_iso
+from backend.vector_math import as_matrix, cosine_similarities, cosine_to_angle
+
 
+logger = logging.getLogger(__name__)
 
 _CROSS_USER_REFUSAL = "No puedo acceder a memorias de otros usuarios."
 _SELF_REFERENCES = {"mi", "mis", "mio", "mia", "mios", "mias", "yo"}
+_SUMMARY_HEADER = "Resumen de la conversacion anterior:"
+_DECIDER_FULL = "Demasiadas decisiones de memoria pendientes; se omite el turno."
 
 
 class ChatState(TypedDict):
     tenant_id: str
+    session_id: str
     user_message: str
     chat_history: List[Dict[str, str]]
+    history_summary: str
     system_prompt: str
+    query_vector: List[float]
+    retrieval_vector: List[float]
+    cached_answer: Optional[str]
     retrieved_memories: List[Dict[str, Any]]
+    context_memories: List[Dict[str, Any]]
     assistant_answer: str
-    memory_decision: Optional[MemoryDecision]
+    # Future (o Task en el grafo asincrono) del decisor de memoria, que corre
+    # fuera del grafo para no retrasar la respuesta.
+    memory_decision: Any
 
 
 def _format_memories(memories: List[Dict[str, Any]]) -> str:
@@ -42,6 +74,36 @@ def _format_memories(memories: List[Dict[str, Any]]) -> str:
     return "\n".join(lines)
 
 
+def _local_duplicate_check(
+    candidate_vector: List[float],
+    query_vector: Optional[List[float]],
+    memories: List[Dict[str, Any]],
+    threshold: float,
+    top_k: int,
+) -> Optional[bool]:
+    # True: duplicado; False: seguro que no hay duplicado; None: no concluyente.
+    vectors = [memory["vector"] for memory in memories if memory.get("vector")]
+    if vectors:
+        scores = cosine_similarities(as_matrix(vectors), candidate_vector)
+        if float(scores.max()) >= threshold:
+            return True
+    if not query_vector or len(vectors) != len(memories):
+        return None
+    if len(memories) < top_k:
+        # La busqueda devolvio todas las memorias del usuario.
+        return False
+    # Desigualdad triangular sobre angulos: una memoria no recuperada esta
+    # al menos tan lejos de la consulta como la peor recuperada.
+    worst_score = min(memory.get("score") or 0.0 for memory in memories)
+    query_score = float(
+        cosine_similarities(as_matrix([query_vector]), candidate_vector)[0]
+    )
+    margin = cosine_to_angle(worst_score) - cosine_to_angle(query_score)
+    if margin > cosine_to_angle(threshold):
+        return False
+    return None
+
+
 def _normalize_text(text: str) -> str:
     if not text:
         return ""
@@ -87,111 +149,644 @@ def _is_cross_user_request(user_message: str, tenant_id: str) -> bool:
     return False
 
 
-def build_memory_graph(settings: Settings):
-    chat_model = get_chat_model(settings)
-    embeddings = get_embedding_model(settings)
-    store = QdrantStore(settings)
+def _build_answer_messages(
+    state: ChatState, settings: Settings, count_tokens: TokenCounter
+) -> List:
+    system_prompt = state.get("system_prompt") or SYSTEM_CHAT_PROMPT
+    summary = state.get("history_summary") or ""
+    summary_context = f"{_SUMMARY_HEADER}\n{summary}" if summary else ""
+    fixed_tokens = sum(
+        message_tokens(text, count_tokens)
+        for text in (system_prompt, summary_context, state["user_message"])
+        if text
+    )
 
-    def retrieve_memories(state: ChatState) -> Dict[str, Any]:
+    # Los turnos recientes se reservan antes que los recuerdos y con el mismo
+    # presupuesto que usa el resumidor: lo que no entra aqui es exactamente
+    # lo que cubre el resumen acumulado, sin huecos entre ambos.
+    history = trim_chat_history(
+        state.get("chat_history", []), settings.history_max_messages
+    )
+    history = history[
+        fit_history(history, settings.history_token_budget, count_tokens):
+    ]
+    fixed_tokens += sum(
+        message_tokens(message.get("content", ""), count_tokens) for message in history
+    )
+
+    # Si los recuerdos no caben en el presupuesto se descartan primero los
+    # menos relevantes (el reranking los devuelve ordenados).
+    memories = list(state.get("context_memories", []))
+    memory_context = _format_memories(memories)
+    while memories and (
+        fixed_tokens + message_tokens(memory_context, count_tokens)
+        > settings.context_token_budget
+    ):
+        memories.pop()
+        memory_context = _format_memories(memories)
+
+    messages = [SystemMessage(content=system_prompt)]
+    if memory_context:
+        messages.append(SystemMessage(content=memory_context))
+    if summary_context:
+        messages.append(SystemMessage(content=summary_context))
+    messages.extend(_messages_from_history(history))
+    messages.append(HumanMessage(content=state["user_message"]))
+    return messages
+
+
+def _candidate_limit(settings: Settings) -> int:
+    return settings.memory_top_k * max(1, settings.memory_oversample)
+
+
+def _memories_from_results(results) -> List[Dict[str, Any]]:
+    memories = []
+    for result in results:
+        payload = result.payload or {}
+        memories.append(
+            {
+                "memory_id": payload.get("memory_id", str(result.id)),
+                "memory_type": payload.get("memory_type", "fact"),
+                "text": payload.get("text", ""),
+                "created_at": payload.get("created_at", ""),
+                "importance": payload.get("importance", 3),
+                "score": result.score,
+                "vector": result.vector,
+            }
+        )
+    return memories
+
+
+def _decider_messages(user_message: str) -> List:
+    prompt = MEMORY_DECIDER_USER_PROMPT.format(user_message=user_message)
+    return [
+        SystemMessage(content=MEMORY_DECIDER_SYSTEM_PROMPT),
+        HumanMessage(content=prompt),
+    ]
+
+
+def _parse_memory_decision(content: str) -> Optional[MemoryDecision]:
+    payload = extract_json(content)
+    if not payload:
+        return None
+    try:
+        decision = MemoryDecision.model_validate(payload)
+    except Exception:
+        return None
+    if decision.should_store and decision.memory is None:
+        return None
+    return decision
+
+
+def _memory_candidate(
+    decision: Optional[MemoryDecision], retrieved_memories: List[Dict[str, Any]]
+) -> Optional[MemoryCandidate]:
+    if not decision or not decision.should_store or not decision.memory:
+        return None
+    candidate = decision.memory
+    candidate_text_norm = _normalize_text(candidate.text)
+    if not candidate_text_norm:
+        return None
+    for memory in retrieved_memories:
+        existing_norm = _normalize_text(memory.get("text", ""))
+        if existing_norm and existing_norm == candidate_text_norm:
+            return None
+    return candidate
+
+
+def _is_batch_duplicate(
+    vector: List[float], accepted: List[List[float]], threshold: float
+) -> bool:
+    if not accepted:
+        return False
+    return float(cosine_similarities(as_matrix(accepted), vector).max()) >= threshold
+
+
+def _has_similar_match(similar, threshold: float) -> bool:
+    return any(
+        match.score is not None and match.score >= threshold for match in similar
+    )
+
+
+def _memory_payload(tenant_id: str, candidate: MemoryCandidate, memory_id: str):
+    return {
+        "tenant_id": tenant_id,
+        "memory_id": memory_id,
+        "memory_type": candidate.memory_type,
+        "text": candidate.text,
+        "created_at": utc_now_iso(),
+        "importance": candidate.importance,
+        "source": "chat",
+    }
+
+
+def _build_memory_gate(settings: Settings) -> Optional[MemoryGate]:
+    if not settings.memory_gate_enabled:
+        return None
+    return MemoryGate(
+        settings.memory_gate_similarity,
+        settings.memory_gate_min_words,
+        settings.memory_gate_skip_questions,
+    )
+
+
+def _build_answer_cache(
+    settings: Settings, versions: MemoryVersions
+) -> Optional[SemanticAnswerCache]:
+    if not settings.answer_cache_enabled:
+        return None
+    return SemanticAnswerCache(
+        versions,
+        settings.answer_cache_similarity,
+        settings.answer_cache_ttl_seconds,
+        settings.answer_cache_size,
+    )
+
+
+def _answer_scope(state: ChatState) -> str:
+    return answer_scope(state["system_prompt"], state.get("chat_history", [])[-2:])
+
+
+def _lookup_answer(
+    answer_cache: Optional[SemanticAnswerCache],
+    state: ChatState,
+    query_vector: List[float],
+) -> Optional[str]:
+    if answer_cache is None or not query_vector:
+        return None
+    return answer_cache.get(state["tenant_id"], _answer_scope(state), query_vector)
+
+
+def _remember_answer(
+    answer_cache: Optional[SemanticAnswerCache], state: ChatState, answer: str
+) -> None:
+    if answer_cache is None or not state.get("query_vector"):
+        return
+    answer_cache.put(
+        state["tenant_id"],
+        _answer_scope(state),
+        state["query_vector"],
+        answer,
+    )
+
+
+def _build_retrieval_cache(
+    settings: Settings, versions: MemoryVersions
+) -> Optional[SessionRetrievalCache]:
+    if not settings.retrieval_reuse_enabled:
+        return None
+    return SessionRetrievalCache(
+        versions,
+        settings.retrieval_reuse_similarity,
+        settings.retrieval_reuse_sessions,
+    )
+
+
+def _rescore_memories(
+    memories: List[Dict[str, Any]], query_vector: List[float]
+) -> List[Dict[str, Any]]:
+    vectors = [memory.get("vector") for memory in memories]
+    if not memories or not all(vectors):
+        return memories
+    scores = cosine_similarities(as_matrix(vectors), query_vector)
+    return [
+        dict(memory, score=float(score)) for memory, score in zip(memories, scores)
+    ]
+
+
+def _retrieval_update(
+    memories: List[Dict[str, Any]],
+    retrieval_vector: List[float],
+    query_vector: List[float],
+    settings: Settings,
+) -> Dict[str, Any]:
+    # retrieved_memories conserva la lista completa y los scores contra el
+    # vector con el que se busco, que es lo que necesita la deteccion de
+    # duplicados. El prompt recibe la seleccion del reranking (similitud,
+    # importancia, recencia y MMR) puntuada contra la consulta actual.
+    scored = memories
+    if retrieval_vector is not query_vector:
+        scored = _rescore_memories(memories, query_vector)
+    return {
+        "retrieved_memories": memories,
+        "retrieval_vector": retrieval_vector,
+        "context_memories": rerank_memories(scored, settings),
+    }
+
+
+def _reuse_retrieval(
+    retrieval_cache: Optional[SessionRetrievalCache],
+    state: ChatState,
+    query_vector: List[float],
+    settings: Settings,
+) -> Optional[Dict[str, Any]]:
+    session_id = state.get("session_id")
+    if retrieval_cache is None or not session_id:
+        return None
+    reused = retrieval_cache.get(session_id, state["tenant_id"], query_vector)
+    if reused is None:
+        return None
+    retrieval_vector, memories = reused
+    return _retrieval_update(memories, retrieval_vector, query_vector, settings)
+
+
+def _remember_retrieval(
+    retrieval_cache: Optional[SessionRetrievalCache],
+    state: ChatState,
+    query_vector: List[float],
+    memories: List[Dict[str, Any]],
+) -> None:
+    session_id = state.get("session_id")
+    if retrieval_cache is None or not session_id:
+        return
+    retrieval_cache.put(session_id, state["tenant_id"], query_vector, memories)
+
+
+def _wire_graph(embed_query, retrieve_memories, generate_answer, persist_memory):
+    graph = StateGraph(ChatState)
+    graph.add_node("embed_query", embed_query)
+    graph.add_node("retrieve_memories", retrieve_memories)
+    graph.add_node("generate_answer", generate_answer)
+    graph.add_node("persist_memory", persist_memory)
+
+    # El decisor de memoria no es un nodo: LangGraph ejecuta por pasos y una
+    # rama paralela haria esperar a generate_answer hasta que terminara. Se
+    # lanza desde embed_query y persist_memory recoge su resultado.
+    graph.add_edge(START, "embed_query")
+    graph.add_edge("embed_query", "retrieve_memories")
+    graph.add_edge("retrieve_memories", "generate_answer")
+    graph.add_edge("generate_answer", "persist_memory")
+    graph.add_edge("persist_memory", END)
+
+    return graph.compile()
+
+
+def build_memory_graph(
+    settings: Settings, chat_model=None, embeddings=None, store=None
+):
+    chat_model = chat_model or get_chat_model(settings)
+    embeddings = embeddings or get_embedding_model(settings)
+    store = store or get_memory_store(settings)
+    worker = MemoryWorkerPool(settings.memory_workers, settings.memory_queue_size)
+    atexit.register(worker.shutdown)
+    gate = _build_memory_gate(settings)
+    count_tokens = get_token_counter(settings)
+    versions = MemoryVersions()
+    answer_cache = _build_answer_cache(settings, versions)
+    retrieval_cache = _build_retrieval_cache(settings, versions)
+    decider = ThreadPoolExecutor(
+        max_workers=max(1, settings.memory_workers),
+        thread_name_prefix="memory-decider",
+    )
+    # La cola del executor no tiene limite: como en MemoryWorkerPool, las
+    # decisiones pendientes se acotan y las que sobran se descartan.
+    decider_slots = threading.BoundedSemaphore(max(1, settings.memory_queue_size))
+
+    @timed("decide_memory")
+    def decide_memory(
+        user_message: str, query_vector: List[float]
+    ) -> Optional[MemoryDecision]:
+        if gate is not None:
+            if gate.needs_prototypes:
+                gate.load_prototypes(
+                    embeddings.embed_documents(list(TRIVIAL_MESSAGE_PROTOTYPES))
+                )
+            if gate.should_skip(user_message, query_vector):
+                return None
+        response = chat_model.invoke(_decider_messages(user_message))
+        record_llm_usage(response, "decide_memory")
+        return _parse_memory_decision(response.content)
+
+    def start_decision(
+        user_message: str, query_vector: List[float]
+    ) -> Optional[Future]:
+        if not decider_slots.acquire(blocking=False):
+            logger.warning(_DECIDER_FULL)
+            return None
+        future = decider.submit(decide_memory, user_message, query_vector)
+        future.add_done_callback(lambda _: decider_slots.release())
+        return future
+
+    @timed("embed_query")
+    def embed_query(state: ChatState) -> Dict[str, Any]:
         query = state.get("user_message", "").strip()
         if not query:
-            return {"retrieved_memories": []}
+            return {"query_vector": []}
         query_vector = embeddings.embed_query(query)
-        results = store.search(query_vector, state["tenant_id"], settings.memory_top_k)
-        memories = []
-        for result in results:
-            payload = result.payload or {}
-            memories.append(
-                {
-                    "memory_id": payload.get("memory_id", str(result.id)),
-                    "memory_type": payload.get("memory_type", "fact"),
-                    "text": payload.get("text", ""),
-                    "created_at": payload.get("created_at", ""),
-                    "importance": payload.get("importance", 3),
-                }
-            )
-        return {"retrieved_memories": memories}
+        return {
+            "query_vector": query_vector,
+            "cached_answer": _lookup_answer(answer_cache, state, query_vector),
+            "memory_decision": start_decision(state["user_message"], query_vector),
+        }
 
-    def generate_answer(state: ChatState) -> Dict[str, Any]:
-        history = trim_chat_history(
-            state.get("chat_history", []), settings.history_max_messages
+    @timed("retrieve_memories")
+    def retrieve_memories(state: ChatState) -> Dict[str, Any]:
+        query_vector = state.get("query_vector")
+        if not query_vector or state.get("cached_answer"):
+            return {"retrieved_memories": [], "context_memories": []}
+        # Turnos seguidos de la misma sesion suelen buscar lo mismo: si la
+        # consulta es casi igual a la anterior y no hay memorias nuevas se
+        # reutilizan sus resultados sin ir a Qdrant.
+        reused = _reuse_retrieval(retrieval_cache, state, query_vector, settings)
+        if reused is not None:
+            return reused
+        results = store.search(
+            query_vector,
+            state["tenant_id"],
+            _candidate_limit(settings),
+            with_vectors=True,
         )
-        system_prompt = state.get("system_prompt") or SYSTEM_CHAT_PROMPT
-        messages = [SystemMessage(content=system_prompt)]
-        memory_context = _format_memories(state.get("retrieved_memories", []))
-        if memory_context:
-            messages.append(SystemMessage(content=memory_context))
-        messages.extend(_messages_from_history(history))
-        messages.append(HumanMessage(content=state["user_message"]))
+        memories = _memories_from_results(results)
+        _remember_retrieval(retrieval_cache, state, query_vector, memories)
+        return _retrieval_update(memories, query_vector, query_vector, settings)
+
+    @timed("generate_answer")
+    def generate_answer(state: ChatState) -> Dict[str, Any]:
+        cached_answer = state.get("cached_answer")
+        if cached_answer:
+            return {"assistant_answer": cached_answer, "cached_answer": cached_answer}
+        messages = _build_answer_messages(state, settings, count_tokens)
         response = chat_model.invoke(messages)
-        return {"assistant_answer": response.content.strip()}
+        record_llm_usage(response, "generate_answer")
+        answer = response.content.strip()
+        _remember_answer(answer_cache, state, answer)
+        return {"assistant_answer": answer}
 
-    def decide_memory(state: ChatState) -> Dict[str, Any]:
-        prompt = MEMORY_DECIDER_USER_PROMPT.format(
-            user_message=state["user_message"],
+    @timed("store_memory")
+    def store_memories(batch: List[PendingMemory]) -> None:
+        vectors = embeddings.embed_documents([item.candidate.text for item in batch])
+        accepted: Dict[str, List[List[float]]] = {}
+        points = []
+        for item, vector in zip(batch, vectors):
+            tenant_vectors = accepted.setdefault(item.tenant_id, [])
+            if _is_batch_duplicate(
+                vector, tenant_vectors, settings.memory_dedup_threshold
+            ):
+                continue
+            is_duplicate = _local_duplicate_check(
+                vector,
+                item.query_vector,
+                item.retrieved_memories,
+                settings.memory_dedup_threshold,
+                _candidate_limit(settings),
+            )
+            if is_duplicate is None:
+                similar = store.search(vector, item.tenant_id, settings.memory_top_k)
+                is_duplicate = _has_similar_match(
+                    similar, settings.memory_dedup_threshold
+                )
+            if is_duplicate:
+                # Skip near-duplicates; update strategy can be added later.
+                continue
+            memory_id = new_uuid()
+            payload = _memory_payload(item.tenant_id, item.candidate, memory_id)
+            points.append((memory_id, vector, payload))
+            tenant_vectors.append(vector)
+        store.upsert_many(points)
+        for tenant_id in {payload["tenant_id"] for _, _, payload in points}:
+            versions.bump(tenant_id)
+
+    write_buffer = MemoryWriteBuffer(
+        store_memories,
+        worker.submit,
+        settings.memory_write_batch_size,
+        settings.memory_write_max_delay_seconds,
+    )
+    atexit.register(write_buffer.close)
+    # atexit ejecuta en orden inverso: las decisiones pendientes terminan
+    # antes de que se vacie el buffer.
+    atexit.register(decider.shutdown)
+
+    @timed("persist_memory")
+    def persist_memory(state: ChatState) -> Dict[str, Any]:
+        # El turno no espera al decisor: cuando termina, el guardado
+        # (embedding + dedup + upsert) se acumula en un buffer que se vacia
+        # por lotes en segundo plano.
+        pending: Optional[Future] = state.get("memory_decision")
+        if pending is None:
+            return {}
+        tenant_id = state["tenant_id"]
+        # Sin retrieval_vector (respuesta desde la cache) no hubo busqueda y
+        # la deteccion de duplicados tiene que consultar el store.
+        query_vector = state.get("retrieval_vector")
+        retrieved_memories = state.get("retrieved_memories", [])
+
+        def enqueue(future: Future) -> None:
+            if future.exception() is not None:
+                logger.error(
+                    "No se pudo decidir si guardar la memoria.",
+                    exc_info=future.exception(),
+                )
+                return
+            candidate = _memory_candidate(future.result(), retrieved_memories)
+            if candidate is None:
+                return
+            write_buffer.add(
+                PendingMemory(
+                    tenant_id=tenant_id,
+                    candidate=candidate,
+                    query_vector=query_vector,
+                    retrieved_memories=retrieved_memories,
+                )
+            )
+
+        pending.add_done_callback(enqueue)
+        return {}
+
+    return _wire_graph(embed_query, retrieve_memories, generate_answer, persist_memory)
+
+
+class AsyncMemoryGraph:
+    # Envuelve el grafo compilado para que el host pueda cerrar el pool de
+    # guardado y el store: sin aclose(), los guardados pendientes se cancelan
+    # al terminar el event loop.
+    def __init__(
+        self, graph, worker: AsyncMemoryWorkerPool, store, owns_store: bool
+    ) -> None:
+        self.graph = graph
+        self._worker = worker
+        self._store = store
+        self._owns_store = owns_store
+
+    def ainvoke(self, *args, **kwargs):
+        return self.graph.ainvoke(*args, **kwargs)
+
+    def astream(self, *args, **kwargs):
+        return self.graph.astream(*args, **kwargs)
+
+    async def aclose(self) -> None:
+        await self._worker.shutdown()
+        # Un store recibido del host lo cierra el host.
+        if self._owns_store:
+            await self._store.close()
+
+
+def build_async_memory_graph(
+    settings: Settings, chat_model=None, embeddings=None, store=None
+) -> AsyncMemoryGraph:
+    chat_model = chat_model or get_chat_model(settings)
+    embeddings = embeddings or get_embedding_model(settings)
+    owns_store = store is None
+    store = store or get_async_memory_store(settings)
+    worker = AsyncMemoryWorkerPool(settings.memory_queue_size)
+    gate = _build_memory_gate(settings)
+    count_tokens = get_token_counter(settings)
+    versions = MemoryVersions()
+    answer_cache = _build_answer_cache(settings, versions)
+    retrieval_cache = _build_retrieval_cache(settings, versions)
+    pending_decisions: Set["asyncio.Task"] = set()
+
+    @timed("decide_memory")
+    async def decide_memory(
+        user_message: str, query_vector: List[float]
+    ) -> Optional[MemoryDecision]:
+        if gate is not None:
+            if gate.needs_prototypes:
+                gate.load_prototypes(
+                    await embeddings.aembed_documents(list(TRIVIAL_MESSAGE_PROTOTYPES))
+                )
+            if gate.should_skip(user_message, query_vector):
+                return None
+        response = await chat_model.ainvoke(_decider_messages(user_message))
+        record_llm_usage(response, "decide_memory")
+        return _parse_memory_decision(response.content)
+
+    def start_decision(
+        user_message: str, query_vector: List[float]
+    ) -> Optional["asyncio.Task"]:
+        if len(pending_decisions) >= max(1, settings.memory_queue_size):
+            logger.warning(_DECIDER_FULL)
+            return None
+        # Contexto vacio: la llamada del decisor no debe colarse en el stream
+        # del grafo, que puede haber terminado cuando responda.
+        task = asyncio.get_running_loop().create_task(
+            decide_memory(user_message, query_vector),
+            context=contextvars.Context(),
         )
-        response = chat_model.invoke(
-            [
-                SystemMessage(content=MEMORY_DECIDER_SYSTEM_PROMPT),
-                HumanMessage(content=prompt),
-            ]
+        pending_decisions.add(task)
+        task.add_done_callback(pending_decisions.discard)
+        return task
+
+    @timed("embed_query")
+    async def embed_query(state: ChatState) -> Dict[str, Any]:
+        query = state.get("user_message", "").strip()
+        if not query:
+            return {"query_vector": []}
+        query_vector = await embeddings.aembed_query(query)
+        return {
+            "query_vector": query_vector,
+            "cached_answer": _lookup_answer(answer_cache, state, query_vector),
+            "memory_decision": start_decision(state["user_message"], query_vector),
+        }
+
+    @timed("retrieve_memories")
+    async def retrieve_memories(state: ChatState) -> Dict[str, Any]:
+        query_vector = state.get("query_vector")
+        if not query_vector or state.get("cached_answer"):
+            return {"retrieved_memories": [], "context_memories": []}
+        reused = _reuse_retrieval(retrieval_cache, state, query_vector, settings)
+        if reused is not None:
+            return reused
+        results = await store.search(
+            query_vector,
+            state["tenant_id"],
+            _candidate_limit(settings),
+            with_vectors=True,
         )
-        payload = extract_json(response.content)
-        if not payload:
-            return {"memory_decision": None}
-        try:
-            decision = MemoryDecision.model_validate(payload)
-        except Exception:
-            return {"memory_decision": None}
-        if decision.should_store and decision.memory is None:
-            return {"memory_decision": None}
-        return {"memory_decision": decision}
-
-    def store_memory(state: ChatState) -> Dict[str, Any]:
-        decision = state.get("memory_decision")
-        if not decision or not decision.should_store or not decision.memory:
-            return {}
-        candidate = decision.memory
-        candidate_text_norm = _normalize_text(candidate.text)
-        if not candidate_text_norm:
-            return {}
-        retrieved = state.get("retrieved_memories", [])
-        for memory in retrieved:
-            existing_norm = _normalize_text(memory.get("text", ""))
-            if existing_norm and existing_norm == candidate_text_norm:
-                return {}
-        vector = embeddings.embed_query(candidate.text)
-        similar = store.search(vector, state["tenant_id"], settings.memory_top_k)
-        for match in similar:
-            if match.score is not None and match.score >= settings.memory_dedup_threshold:
-                # Skip near-duplicates; update strategy can be added later.
-                return {}
+        memories = _memories_from_results(results)
+        _remember_retrieval(retrieval_cache, state, query_vector, memories)
+        return _retrieval_update(memories, query_vector, query_vector, settings)
+
+    @timed("generate_answer")
+    async def generate_answer(state: ChatState) -> Dict[str, Any]:
+        cached_answer = state.get("cached_answer")
+        if cached_answer:
+            return {"assistant_answer": cached_answer, "cached_answer": cached_answer}
+        messages = _build_answer_messages(state, settings, count_tokens)
+        response = await chat_model.ainvoke(messages)
+        record_llm_usage(response, "generate_answer")
+        answer = response.content.strip()
+        _remember_answer(answer_cache, state, answer)
+        return {"assistant_answer": answer}
+
+    @timed("store_memory")
+    async def store_memory(state: ChatState, pending: "asyncio.Task") -> None:
+        candidate = _memory_candidate(
+            await pending, state.get("retrieved_memories", [])
+        )
+        if candidate is None:
+            return
+        vector = await embeddings.aembed_query(candidate.text)
+        is_duplicate = _local_duplicate_check(
+            vector,
+            state.get("retrieval_vector"),
+            state.get("retrieved_memories", []),
+            settings.memory_dedup_threshold,
+            _candidate_limit(settings),
+        )
+        if is_duplicate is None:
+            similar = await store.search(
+                vector, state["tenant_id"], settings.memory_top_k
+            )
+            is_duplicate = _has_similar_match(similar, settings.memory_dedup_threshold)
+        if is_duplicate:
+            return
         memory_id = new_uuid()
-        payload = {
-            "tenant_id": state["tenant_id"],
-            "memory_id": memory_id,
-            "memory_type": candidate.memory_type,
-            "text": candidate.text,
-            "created_at": utc_now_iso(),
-            "importance": candidate.importance,
-            "source": "chat",
-        }
-        store.upsert(memory_id, vector, payload)
+        payload = _memory_payload(state["tenant_id"], candidate, memory_id)
+        await store.upsert(memory_id, vector, payload)
+        versions.bump(state["tenant_id"])
+
+    @timed("persist_memory")
+    async def persist_memory(state: ChatState) -> Dict[str, Any]:
+        pending = state.get("memory_decision")
+        if pending is None:
+            return {}
+        snapshot = dict(state)
+        worker.submit(lambda: store_memory(snapshot, pending))
         return {}
 
-    graph = StateGraph(ChatState)
-    graph.add_node("retrieve_memories", retrieve_memories)
-    graph.add_node("generate_answer", generate_answer)
-    graph.add_node("decide_memory", decide_memory)
-    graph.add_node("store_memory", store_memory)
+    graph = _wire_graph(embed_query, retrieve_memories, generate_answer, persist_memory)
+    return AsyncMemoryGraph(graph, worker, store, owns_store)
 
-    graph.set_entry_point("retrieve_memories")
-    graph.add_edge("retrieve_memories", "generate_answer")
-    graph.add_edge("generate_answer", "decide_memory")
-    graph.add_edge("decide_memory", "store_memory")
-    graph.add_edge("store_memory", END)
 
-    return graph.compile()
+def _initial_state(
+    tenant_id: str,
+    user_message: str,
+    chat_history: List[Dict[str, str]],
+    system_prompt: Optional[str],
+    history_summary: Optional[str],
+    session_id: Optional[str],
+) -> Dict[str, Any]:
+    return {
+        "tenant_id": tenant_id,
+        "session_id": session_id or "",
+        "user_message": user_message,
+        "chat_history": chat_history,
+        "history_summary": history_summary or "",
+        "system_prompt": system_prompt or SYSTEM_CHAT_PROMPT,
+    }
+
+
+def _stream_token(chunk, metadata: Dict[str, Any]) -> str:
+    # stream_mode="messages" emite los tokens del LLM de cada nodo;
+    # solo reenviamos los de generate_answer.
+    if metadata.get("langgraph_node") != "generate_answer":
+        return ""
+    content = getattr(chunk, "content", "")
+    return content if isinstance(content, str) else ""
+
+
+_STREAM_MODES = ["messages", "updates"]
+
+
+def _stream_text(mode: str, payload: Any) -> str:
+    if mode == "messages":
+        chunk, metadata = payload
+        return _stream_token(chunk, metadata)
+    # Una respuesta servida desde la cache no pasa por el LLM, asi que llega
+    # completa en la actualizacion del nodo.
+    update = (payload or {}).get("generate_answer") or {}
+    return update.get("cached_answer") or ""
 
 
 def run_chat(
@@ -200,16 +795,99 @@ def run_chat(
     user_message: str,
     chat_history: List[Dict[str, str]],
     system_prompt: Optional[str] = None,
+    history_summary: Optional[str] = None,
+    session_id: Optional[str] = None,
 ) -> str:
     if _is_cross_user_request(user_message, tenant_id):
         return _CROSS_USER_REFUSAL
-    prompt = system_prompt or SYSTEM_CHAT_PROMPT
     result = graph.invoke(
-        {
-            "tenant_id": tenant_id,
-            "user_message": user_message,
-            "chat_history": chat_history,
-            "system_prompt": prompt,
-        }
+        _initial_state(
+            tenant_id,
+            user_message,
+            chat_history,
+            system_prompt,
+            history_summary,
+            session_id,
+        )
     )
     return result.get("assistant_answer", "").strip()
+
+
+def run_chat_stream(
+    graph,
+    tenant_id: str,
+    user_message: str,
+    chat_history: List[Dict[str, str]],
+    system_prompt: Optional[str] = None,
+    history_summary: Optional[str] = None,
+    session_id: Optional[str] = None,
+) -> Iterator[str]:
+    if _is_cross_user_request(user_message, tenant_id):
+        yield _CROSS_USER_REFUSAL
+        return
+    for mode, payload in graph.stream(
+        _initial_state(
+            tenant_id,
+            user_message,
+            chat_history,
+            system_prompt,
+            history_summary,
+            session_id,
+        ),
+        stream_mode=_STREAM_MODES,
+    ):
+        token = _stream_text(mode, payload)
+        if token:
+            yield token
+
+
+async def arun_chat(
+    graph,
+    tenant_id: str,
+    user_message: str,
+    chat_history: List[Dict[str, str]],
+    system_prompt: Optional[str] = None,
+    history_summary: Optional[str] = None,
+    session_id: Optional[str] = None,
+) -> str:
+    if _is_cross_user_request(user_message, tenant_id):
+        return _CROSS_USER_REFUSAL
+    result = await graph.ainvoke(
+        _initial_state(
+            tenant_id,
+            user_message,
+            chat_history,
+            system_prompt,
+            history_summary,
+            session_id,
+        )
+    )
+    return result.get("assistant_answer", "").strip()
+
+
+async def arun_chat_stream(
+    graph,
+    tenant_id: str,
+    user_message: str,
+    chat_history: List[Dict[str, str]],
+    system_prompt: Optional[str] = None,
+    history_summary: Optional[str] = None,
+    session_id: Optional[str] = None,
+) -> AsyncIterator[str]:
+    if _is_cross_user_request(user_message, tenant_id):
+        yield _CROSS_USER_REFUSAL
+        return
+    async for mode, payload in graph.astream(
+        _initial_state(
+            tenant_id,
+            user_message,
+            chat_history,
+            system_prompt,
+            history_summary,
+            session_id,
+        ),
+        stream_mode=_STREAM_MODES,
+    ):
+        token = _stream_text(mode, payload)
+        if token:
+            yield token
@@ -0,0 +1,108 @@
+import re
+import threading
+import unicodedata
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from backend.metrics import registry
+from backend.vector_math import as_matrix, normalize_rows
+
+
+# Mensajes que nunca producen memoria; se usan como prototipos del
+# clasificador por similitud de embeddings.
+TRIVIAL_MESSAGE_PROTOTYPES = (
+    "hola",
+    "hola, como estas?",
+    "buenos dias",
+    "buenas noches",
+    "gracias",
+    "muchas gracias",
+    "ok",
+    "vale, perfecto",
+    "jajaja",
+    "adios, hasta luego",
+    "que me recomiendas?",
+    "puedes explicarme eso?",
+    "que recuerdas de mi?",
+)
+
+_TRIVIAL_WORDS = frozenset(
+    (
+        "hola holi buenas buenos dias tardes noches gracias muchas ok okay vale "
+        "si no claro perfecto genial bien adios chao hasta luego pronto jaja "
+        "jajaja saludos listo bueno dale entendido"
+    ).split()
+)
+_FIRST_PERSON_WORDS = frozenset(
+    (
+        "yo mi mis me soy estoy tengo trabajo vivo prefiero gusta gustan quiero "
+        "odio llamo nombre proyecto recuerda guarda anota"
+    ).split()
+)
+
+
+def _gate_tokens(text: str) -> List[str]:
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    ascii_text = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return re.findall(r"\w+", ascii_text)
+
+
+class MemoryGate:
+    def __init__(
+        self, similarity_threshold: float, min_words: int, skip_questions: bool
+    ) -> None:
+        self._similarity_threshold = similarity_threshold
+        self._min_words = min_words
+        self._skip_questions = skip_questions
+        self._prototypes: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+        self._checked = 0
+        self._skipped = 0
+
+    @property
+    def needs_prototypes(self) -> bool:
+        return self._similarity_threshold > 0 and self._prototypes is None
+
+    def load_prototypes(self, vectors: List[List[float]]) -> None:
+        self._prototypes = normalize_rows(as_matrix(vectors))
+
+    def _skip_by_rules(self, message: str) -> bool:
+        # Por defecto solo se descartan mensajes hechos de palabras triviales;
+        # las reglas de longitud y de preguntas son opcionales porque tambien
+        # descartan datos reales ("Estudio medicina", "¿Sabias que...?").
+        tokens = _gate_tokens(message)
+        if all(token in _TRIVIAL_WORDS for token in tokens):
+            return True
+        if any(token in _FIRST_PERSON_WORDS for token in tokens):
+            return False
+        if len(tokens) < self._min_words:
+            return True
+        if not self._skip_questions:
+            return False
+        stripped = message.strip()
+        return stripped.endswith("?") or stripped.startswith(
+            "\N{INVERTED QUESTION MARK}"
+        )
+
+    def _skip_by_similarity(self, query_vector: Optional[List[float]]) -> bool:
+        if self._similarity_threshold <= 0 or self._prototypes is None:
+            return False
+        if not query_vector:
+            return False
+        query = normalize_rows(np.asarray(query_vector, dtype=np.float32))
+        return float((self._prototypes @ query).max()) >= self._similarity_threshold
+
+    def should_skip(
+        self, message: str, query_vector: Optional[List[float]] = None
+    ) -> bool:
+        skip = self._skip_by_rules(message) or self._skip_by_similarity(query_vector)
+        with self._lock:
+            self._checked += 1
+            self._skipped += int(skip)
+        registry.increment("memory_gate_total", result="skipped" if skip else "passed")
+        return skip
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"checked": self._checked, "skipped": self._skipped}
@@ -0,0 +1,15 @@
+from backend.config import Settings
+from backend.local_store import AsyncLocalVectorStore, LocalVectorStore
+from backend.qdrant_store import AsyncQdrantStore, QdrantStore
+
+
+def get_memory_store(settings: Settings):
+    if settings.vector_store == "local":
+        return LocalVectorStore(settings.local_store_dir)
+    return QdrantStore(settings)
+
+
+def get_async_memory_store(settings: Settings):
+    if settings.vector_store == "local":
+        return AsyncLocalVectorStore(settings.local_store_dir)
+    return AsyncQdrantStore(settings)
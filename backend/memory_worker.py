@@ -0,0 +1,124 @@
+import asyncio
+import logging
+import queue
+import threading
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+
+logger = logging.getLogger(__name__)
+
+MemoryJob = Callable[[], None]
+AsyncMemoryJob = Callable[[], Awaitable[None]]
+
+
+class MemoryWorkerPool:
+    def __init__(self, workers: int, max_queue: int) -> None:
+        self._queue: "queue.Queue[Optional[MemoryJob]]" = queue.Queue(
+            maxsize=max(1, max_queue)
+        )
+        self._lock = threading.Lock()
+        self._closed = False
+        self._threads: List[threading.Thread] = []
+        self._submitted = 0
+        self._dropped = 0
+        self._failed = 0
+        self.last_error: Optional[BaseException] = None
+        for index in range(max(1, workers)):
+            thread = threading.Thread(
+                target=self._run, name=f"memory-worker-{index}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, job: MemoryJob) -> bool:
+        with self._lock:
+            if self._closed:
+                return False
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                self._dropped += 1
+                logger.warning("Cola de memoria llena; se descarta el turno.")
+                return False
+            self._submitted += 1
+            return True
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "submitted": self._submitted,
+                "dropped": self._dropped,
+                "failed": self._failed,
+                "pending": self._queue.qsize(),
+            }
+
+    def _run(self) -> None:
+        while True:
+            job = self._queue.get()
+            try:
+                if job is None:
+                    return
+                job()
+            except Exception as exc:
+                with self._lock:
+                    self._failed += 1
+                    self.last_error = exc
+                logger.exception("No se pudo guardar la memoria en segundo plano.")
+            finally:
+                self._queue.task_done()
+
+    def shutdown(self, timeout: Optional[float] = None) -> None:
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        # Los trabajos pendientes se procesan antes de los centinelas.
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout)
+
+
+class AsyncMemoryWorkerPool:
+    def __init__(self, max_pending: int) -> None:
+        self._max_pending = max(1, max_pending)
+        self._tasks: Set["asyncio.Task[None]"] = set()
+        self._submitted = 0
+        self._dropped = 0
+        self._failed = 0
+        self.last_error: Optional[BaseException] = None
+
+    def submit(self, job: AsyncMemoryJob) -> bool:
+        if len(self._tasks) >= self._max_pending:
+            self._dropped += 1
+            logger.warning("Cola de memoria llena; se descarta el turno.")
+            return False
+        task = asyncio.get_running_loop().create_task(job())
+        self._tasks.add(task)
+        task.add_done_callback(self._on_done)
+        self._submitted += 1
+        return True
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "submitted": self._submitted,
+            "dropped": self._dropped,
+            "failed": self._failed,
+            "pending": len(self._tasks),
+        }
+
+    def _on_done(self, task: "asyncio.Task[None]") -> None:
+        self._tasks.discard(task)
+        if task.cancelled():
+            return
+        exc = task.exception()
+        if exc is not None:
+            self._failed += 1
+            self.last_error = exc
+            logger.error(
+                "No se pudo guardar la memoria en segundo plano.", exc_info=exc
+            )
+
+    async def shutdown(self) -> None:
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
@@ -0,0 +1,80 @@
+from dataclasses import dataclass, field
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from backend.memory_schema import MemoryCandidate
+
+
+@dataclass
+class PendingMemory:
+    tenant_id: str
+    candidate: MemoryCandidate
+    query_vector: Optional[List[float]] = None
+    retrieved_memories: List[Dict[str, Any]] = field(default_factory=list)
+
+
+FlushFn = Callable[[List[PendingMemory]], None]
+SubmitFn = Callable[[Callable[[], None]], bool]
+
+
+class MemoryWriteBuffer:
+    def __init__(
+        self,
+        flush: FlushFn,
+        submit: SubmitFn,
+        max_items: int,
+        max_delay_seconds: float,
+    ) -> None:
+        self._flush = flush
+        self._submit = submit
+        self._max_items = max(1, max_items)
+        self._max_delay = max(0.0, max_delay_seconds)
+        self._items: List[PendingMemory] = []
+        self._oldest = 0.0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._timer = threading.Thread(
+            target=self._run_timer, name="memory-write-buffer", daemon=True
+        )
+        self._timer.start()
+
+    def add(self, item: PendingMemory) -> None:
+        with self._lock:
+            if not self._items:
+                self._oldest = time.monotonic()
+            self._items.append(item)
+            batch = self._take_locked() if len(self._items) >= self._max_items else []
+        if batch:
+            self._dispatch(batch)
+
+    def _take_locked(self) -> List[PendingMemory]:
+        batch, self._items = self._items, []
+        return batch
+
+    def _dispatch(self, batch: List[PendingMemory]) -> None:
+        self._submit(lambda: self._flush(batch))
+
+    def _run_timer(self) -> None:
+        interval = max(0.05, self._max_delay / 2) if self._max_delay else 0.05
+        while not self._stop.wait(interval):
+            with self._lock:
+                due = (
+                    self._items
+                    and time.monotonic() - self._oldest >= self._max_delay
+                )
+                batch = self._take_locked() if due else []
+            if batch:
+                self._dispatch(batch)
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._items)
+
+    def close(self) -> None:
+        self._stop.set()
+        self._timer.join()
+        with self._lock:
+            batch = self._take_locked()
+        if batch:
+            self._dispatch(batch)
@@ -0,0 +1,211 @@
+from collections import defaultdict, deque
+from contextlib import contextmanager
+import functools
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import inspect
+import os
+import threading
+import time
+from typing import Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+
+_PREFIX = "eternum"
+_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelSet = Tuple[Tuple[str, str], ...]
+
+
+def _format_labels(labels: LabelSet) -> str:
+    if not labels:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(key, value.replace("\\", "\\\\").replace('"', '\\"'))
+        for key, value in labels
+    )
+    return f"{{{pairs}}}"
+
+
+class MetricsRegistry:
+    def __init__(self, max_samples: int = 10000) -> None:
+        self.enabled = False
+        self._max_samples = max_samples
+        self._lock = threading.Lock()
+        self._samples: Dict[str, Deque[float]] = defaultdict(
+            lambda: deque(maxlen=self._max_samples)
+        )
+        self._buckets: Dict[str, List[int]] = {}
+        self._sums: Dict[str, float] = defaultdict(float)
+        self._counters: Dict[Tuple[str, LabelSet], float] = defaultdict(float)
+
+    def observe(self, operation: str, seconds: float) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._samples[operation].append(seconds)
+            buckets = self._buckets.setdefault(operation, [0] * (len(_BUCKETS) + 1))
+            for index, bound in enumerate(_BUCKETS):
+                if seconds <= bound:
+                    buckets[index] += 1
+                    break
+            else:
+                buckets[-1] += 1
+            self._sums[operation] += seconds
+
+    def increment(self, name: str, value: float = 1.0, **labels: str) -> None:
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] += value
+
+    def samples(self) -> Dict[str, List[float]]:
+        with self._lock:
+            return {name: list(values) for name, values in self._samples.items()}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._samples.clear()
+            self._buckets.clear()
+            self._sums.clear()
+            self._counters.clear()
+
+    def render_prometheus(self) -> str:
+        histogram = f"{_PREFIX}_operation_seconds"
+        lines = [
+            f"# HELP {histogram} Latencia por operacion.",
+            f"# TYPE {histogram} histogram",
+        ]
+        with self._lock:
+            for operation, buckets in sorted(self._buckets.items()):
+                labels = (("operation", operation),)
+                cumulative = 0
+                for bound, count in zip(_BUCKETS, buckets):
+                    cumulative += count
+                    bucket_labels = _format_labels(labels + (("le", str(bound)),))
+                    lines.append(f"{histogram}_bucket{bucket_labels} {cumulative}")
+                cumulative += buckets[-1]
+                inf_labels = _format_labels(labels + (("le", "+Inf"),))
+                lines.append(f"{histogram}_bucket{inf_labels} {cumulative}")
+                lines.append(
+                    f"{histogram}_sum{_format_labels(labels)} {self._sums[operation]}"
+                )
+                lines.append(f"{histogram}_count{_format_labels(labels)} {cumulative}")
+            seen = set()
+            for (name, labels), value in sorted(self._counters.items()):
+                metric = f"{_PREFIX}_{name}"
+                if metric not in seen:
+                    lines.append(f"# TYPE {metric} counter")
+                    seen.add(metric)
+                lines.append(f"{metric}{_format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+@contextmanager
+def measure(operation: str) -> Iterator[None]:
+    if not registry.enabled:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        registry.increment("errors_total", operation=operation)
+        raise
+    finally:
+        registry.observe(operation, time.perf_counter() - started)
+
+
+def timed(operation: str) -> Callable:
+    def decorator(func: Callable) -> Callable:
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if not registry.enabled:
+                    return await func(*args, **kwargs)
+                with measure(operation):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not registry.enabled:
+                return func(*args, **kwargs)
+            with measure(operation):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def record_llm_usage(response, operation: str) -> None:
+    usage = getattr(response, "usage_metadata", None)
+    if not registry.enabled or not usage:
+        return
+    registry.increment(
+        "llm_tokens_total",
+        usage.get("input_tokens", 0),
+        operation=operation,
+        kind="input",
+    )
+    registry.increment(
+        "llm_tokens_total",
+        usage.get("output_tokens", 0),
+        operation=operation,
+        kind="output",
+    )
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    result = "hit" if hit else "miss"
+    registry.increment("cache_events_total", cache=cache, result=result)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = registry.render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        return
+
+
+def _write_metrics_file(path: str, interval_seconds: float) -> None:
+    while True:
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as handle:
+            handle.write(registry.render_prometheus())
+        os.replace(tmp_path, path)
+        time.sleep(interval_seconds)
+
+
+def start_metrics_exporter(
+    port: Optional[int], path: Optional[str], interval_seconds: float
+) -> Optional[ThreadingHTTPServer]:
+    registry.enabled = True
+    server = None
+    if port:
+        server = ThreadingHTTPServer(("0.0.0.0", port), _MetricsHandler)
+        threading.Thread(
+            target=server.serve_forever, name="metrics-http", daemon=True
+        ).start()
+    if path:
+        threading.Thread(
+            target=_write_metrics_file,
+            args=(path, max(1.0, interval_seconds)),
+            name="metrics-file",
+            daemon=True,
+        ).start()
+    return server
@@ -31,3 +31,16 @@ MEMORY_DECIDER_USER_PROMPT = (
     "Usuario: {user_message}\n"
     "JSON:"
 )
+
+HISTORY_SUMMARY_SYSTEM_PROMPT = (
+    "Mantienes un resumen breve de una conversacion entre un usuario y Eternum. "
+    "Conserva nombres, datos personales, decisiones, temas abiertos y el tono. "
+    "No inventes nada. Escribe en tercera persona y en espanol."
+)
+
+HISTORY_SUMMARY_USER_PROMPT = (
+    "Resumen actual:\n{summary}\n\n"
+    "Mensajes nuevos:\n{messages}\n\n"
+    "Devuelve el resumen actualizado en como maximo {max_words} palabras, "
+    "sin encabezados."
+)
@@ -1,42 +1,124 @@
-from typing import List, Optional
+from typing import List, Optional, Sequence, Tuple
 
-from qdrant_client import QdrantClient
-from qdrant_client.http.models import FieldCondition, Filter, MatchValue, PointStruct
+from qdrant_client import AsyncQdrantClient, QdrantClient
+from qdrant_client.http.models import (
+    Distance,
+    FieldCondition,
+    Filter,
+    HnswConfigDiff,
+    KeywordIndexParams,
+    KeywordIndexType,
+    MatchValue,
+    PointIdsList,
+    PointStruct,
+    QuantizationSearchParams,
+    ScalarQuantization,
+    ScalarQuantizationConfig,
+    ScalarType,
+    SearchParams,
+    VectorParams,
+)
 
 from backend.config import Settings
+from backend.metrics import timed
 
 
-class QdrantStore:
-    def _extract_points(self, response):
-        if hasattr(response, "points"):
-            return response.points
-        if isinstance(response, tuple):
-            first = response[0] if response else []
-            if isinstance(first, list):
-                return first
-        return response
+PointData = Tuple[str, List[float], dict]
+
+
+def _extract_points(response):
+    if hasattr(response, "points"):
+        return response.points
+    if isinstance(response, tuple):
+        first = response[0] if response else []
+        if isinstance(first, list):
+            return first
+    return response
+
+
+# Con cuantizacion int8 se re-puntuan los candidatos con los vectores originales.
+_SEARCH_PARAMS = SearchParams(quantization=QuantizationSearchParams(rescore=True))
 
+
+def _memory_filter(tenant_id: str, memory_type: Optional[str] = None) -> Filter:
+    conditions = [FieldCondition(key="tenant_id", match=MatchValue(value=tenant_id))]
+    if memory_type is not None:
+        conditions.append(
+            FieldCondition(key="memory_type", match=MatchValue(value=memory_type))
+        )
+    return Filter(must=conditions)
+
+
+class QdrantStore:
     def __init__(self, settings: Settings) -> None:
         self._client = QdrantClient(
             url=settings.qdrant_url, api_key=settings.qdrant_api_key
         )
         self._collection = settings.qdrant_collection
+        self._settings = settings
 
+    def ping(self) -> bool:
+        return self._client.collection_exists(self._collection)
+
+    def ensure_collection(self, vector_size: int) -> bool:
+        settings = self._settings
+        hnsw_config = HnswConfigDiff(
+            m=settings.qdrant_hnsw_m, ef_construct=settings.qdrant_hnsw_ef_construct
+        )
+        quantization_config = None
+        if settings.qdrant_quantization:
+            quantization_config = ScalarQuantization(
+                scalar=ScalarQuantizationConfig(
+                    type=ScalarType.INT8, quantile=0.99, always_ram=True
+                )
+            )
+        created = not self._client.collection_exists(self._collection)
+        if created:
+            self._client.create_collection(
+                collection_name=self._collection,
+                vectors_config=VectorParams(size=vector_size, distance=Distance.COSINE),
+                hnsw_config=hnsw_config,
+                quantization_config=quantization_config,
+            )
+        else:
+            self._client.update_collection(
+                collection_name=self._collection,
+                hnsw_config=hnsw_config,
+                quantization_config=quantization_config,
+            )
+        self._client.create_payload_index(
+            collection_name=self._collection,
+            field_name="tenant_id",
+            field_schema=KeywordIndexParams(
+                type=KeywordIndexType.KEYWORD, is_tenant=True
+            ),
+        )
+        self._client.create_payload_index(
+            collection_name=self._collection,
+            field_name="memory_type",
+            field_schema=KeywordIndexParams(type=KeywordIndexType.KEYWORD),
+        )
+        return created
+
+    @timed("store.search")
     def search(
-        self, query_vector: List[float], tenant_id: str, limit: int
+        self,
+        query_vector: List[float],
+        tenant_id: str,
+        limit: int,
+        with_vectors: bool = False,
     ):
-        query_filter = Filter(
-            must=[FieldCondition(key="tenant_id", match=MatchValue(value=tenant_id))]
-        )
         # Usar query_points en lugar de search
         response = self._client.query_points(
             collection_name=self._collection,
             query=query_vector,
-            query_filter=query_filter,
+            query_filter=_memory_filter(tenant_id),
             limit=limit,
             with_payload=True,
+            search_params=_SEARCH_PARAMS,
+            with_vectors=with_vectors,
         )
-        return self._extract_points(response)
+        return _extract_points(response)
 
     def search_similar(
         self,
@@ -45,20 +127,15 @@ class QdrantStore:
         memory_type: str,
         limit: int,
     ):
-        query_filter = Filter(
-            must=[
-                FieldCondition(key="tenant_id", match=MatchValue(value=tenant_id)),
-                FieldCondition(key="memory_type", match=MatchValue(value=memory_type)),
-            ]
-        )
         response = self._client.query_points(
             collection_name=self._collection,
             query=query_vector,
-            query_filter=query_filter,
+            query_filter=_memory_filter(tenant_id, memory_type),
             limit=limit,
             with_payload=True,
+            search_params=_SEARCH_PARAMS,
         )
-        return self._extract_points(response)
+        return _extract_points(response)
 
     def upsert(
         self,
@@ -68,3 +145,110 @@ class QdrantStore:
     ) -> None:
         point = PointStruct(id=memory_id, vector=vector, payload=payload)
         self._client.upsert(collection_name=self._collection, points=[point])
+
+    @timed("store.upsert")
+    def upsert_many(self, points: Sequence[PointData]) -> None:
+        if not points:
+            return
+        self._client.upsert(
+            collection_name=self._collection,
+            points=[
+                PointStruct(id=memory_id, vector=vector, payload=payload)
+                for memory_id, vector, payload in points
+            ],
+        )
+
+    def scroll(
+        self,
+        tenant_id: Optional[str],
+        limit: int,
+        offset=None,
+        with_vectors: bool = False,
+    ):
+        return self._client.scroll(
+            collection_name=self._collection,
+            scroll_filter=_memory_filter(tenant_id) if tenant_id else None,
+            limit=limit,
+            offset=offset,
+            with_payload=True,
+            with_vectors=with_vectors,
+        )
+
+    def delete_many(self, memory_ids: Sequence[str]) -> None:
+        if not memory_ids:
+            return
+        self._client.delete(
+            collection_name=self._collection,
+            points_selector=PointIdsList(points=list(memory_ids)),
+        )
+
+
+class AsyncQdrantStore:
+    def __init__(self, settings: Settings) -> None:
+        self._client = AsyncQdrantClient(
+            url=settings.qdrant_url, api_key=settings.qdrant_api_key
+        )
+        self._collection = settings.qdrant_collection
+
+    async def ping(self) -> bool:
+        return await self._client.collection_exists(self._collection)
+
+    @timed("store.search")
+    async def search(
+        self,
+        query_vector: List[float],
+        tenant_id: str,
+        limit: int,
+        with_vectors: bool = False,
+    ):
+        response = await self._client.query_points(
+            collection_name=self._collection,
+            query=query_vector,
+            query_filter=_memory_filter(tenant_id),
+            limit=limit,
+            with_payload=True,
+            search_params=_SEARCH_PARAMS,
+            with_vectors=with_vectors,
+        )
+        return _extract_points(response)
+
+    async def search_similar(
+        self,
+        query_vector: List[float],
+        tenant_id: str,
+        memory_type: str,
+        limit: int,
+    ):
+        response = await self._client.query_points(
+            collection_name=self._collection,
+            query=query_vector,
+            query_filter=_memory_filter(tenant_id, memory_type),
+            limit=limit,
+            with_payload=True,
+            search_params=_SEARCH_PARAMS,
+        )
+        return _extract_points(response)
+
+    async def upsert(
+        self,
+        memory_id: str,
+        vector: List[float],
+        payload: dict,
+    ) -> None:
+        point = PointStruct(id=memory_id, vector=vector, payload=payload)
+        await self._client.upsert(collection_name=self._collection, points=[point])
+
+    @timed("store.upsert")
+    async def upsert_many(self, points: Sequence[PointData]) -> None:
+        if not points:
+            return
+        await self._client.upsert(
+            collection_name=self._collection,
+            points=[
+                PointStruct(id=memory_id, vector=vector, payload=payload)
+                for memory_id, vector, payload in points
+            ],
+        )
+
+    async def close(self) -> None:
+        await self._client.close()
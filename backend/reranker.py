@@ -0,0 +1,90 @@
+from datetime import datetime, timezone
+import math
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from backend.config import Settings
+from backend.vector_math import as_matrix, normalize_rows
+
+
+def _age_days(created_at: Any, now: datetime) -> float:
+    try:
+        created = datetime.fromisoformat(str(created_at))
+    except ValueError:
+        return math.inf
+    if created.tzinfo is None:
+        created = created.replace(tzinfo=timezone.utc)
+    return max(0.0, (now - created).total_seconds() / 86400)
+
+
+def _similarities(memories: List[Dict[str, Any]]) -> np.ndarray:
+    return np.array(
+        [memory.get("score") or 0.0 for memory in memories], dtype=np.float32
+    )
+
+
+def relevance_scores(
+    memories: List[Dict[str, Any]], settings: Settings, now: datetime
+) -> np.ndarray:
+    similarity = _similarities(memories)
+    importance = np.array(
+        [memory.get("importance") or 3 for memory in memories], dtype=np.float32
+    )
+    age = np.array(
+        [_age_days(memory.get("created_at"), now) for memory in memories],
+        dtype=np.float32,
+    )
+    half_life = max(settings.memory_recency_half_life_days, 1e-6)
+    recency = np.exp2(-age / half_life)
+    return (
+        settings.memory_similarity_weight * similarity
+        + settings.memory_importance_weight * np.clip((importance - 1) / 4, 0, 1)
+        + settings.memory_recency_weight * recency
+    )
+
+
+def _mmr_order(
+    relevance: np.ndarray, vectors: Optional[np.ndarray], limit: int, mmr_lambda: float
+) -> List[int]:
+    if vectors is None:
+        return list(np.argsort(-relevance)[:limit])
+    pairwise = vectors @ vectors.T
+    # Maxima similitud de cada candidato con los ya elegidos.
+    redundancy = np.full(len(relevance), -np.inf, dtype=np.float32)
+    available = np.ones(len(relevance), dtype=bool)
+    order: List[int] = []
+    for _ in range(min(limit, len(relevance))):
+        penalty = np.where(np.isinf(redundancy), 0.0, redundancy)
+        mmr = mmr_lambda * relevance - (1 - mmr_lambda) * penalty
+        mmr[~available] = -np.inf
+        best = int(np.argmax(mmr))
+        order.append(best)
+        available[best] = False
+        redundancy = np.maximum(redundancy, pairwise[best])
+    return order
+
+
+def rerank_memories(
+    memories: List[Dict[str, Any]],
+    settings: Settings,
+    now: Optional[datetime] = None,
+) -> List[Dict[str, Any]]:
+    if not memories:
+        return []
+    # El umbral se aplica a la similitud: sobre la suma ponderada, la
+    # importancia y la recencia dejarian pasar memorias sin relacion.
+    keep = np.flatnonzero(_similarities(memories) >= settings.memory_min_score)
+    if keep.size == 0:
+        return []
+    candidates = [memories[index] for index in keep]
+    relevance = relevance_scores(
+        candidates, settings, now or datetime.now(timezone.utc)
+    )
+    vectors = None
+    if all(memory.get("vector") for memory in candidates):
+        vectors = normalize_rows(as_matrix([memory["vector"] for memory in candidates]))
+    order = _mmr_order(
+        relevance, vectors, settings.memory_top_k, settings.memory_mmr_lambda
+    )
+    return [candidates[index] for index in order]
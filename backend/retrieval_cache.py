@@ -0,0 +1,111 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from backend.answer_cache import MemoryVersions
+from backend.metrics import record_cache
+from backend.vector_math import as_matrix, normalize_rows
+
+
+@dataclass
+class _LastRetrieval:
+    tenant_id: str
+    query_vector: np.ndarray
+    normalized: np.ndarray
+    version: int
+    memories: List[Dict[str, Any]]
+    vectors: Optional[np.ndarray]
+
+
+def _split_vectors(
+    memories: List[Dict[str, Any]],
+) -> Tuple[List[Dict[str, Any]], Optional[np.ndarray]]:
+    # Los vectores de los candidatos se guardan en una sola matriz float32:
+    # como listas de floats de Python ocupan unas ocho veces mas.
+    if not memories or not all(memory.get("vector") for memory in memories):
+        return memories, None
+    vectors = as_matrix([memory["vector"] for memory in memories])
+    stripped = [
+        {key: value for key, value in memory.items() if key != "vector"}
+        for memory in memories
+    ]
+    return stripped, vectors
+
+
+class SessionRetrievalCache:
+    def __init__(
+        self, versions: MemoryVersions, similarity_threshold: float, max_sessions: int
+    ) -> None:
+        self._versions = versions
+        self._similarity_threshold = similarity_threshold
+        self._max_sessions = max(1, max_sessions)
+        self._sessions: "OrderedDict[str, _LastRetrieval]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(
+        self, session_id: str, tenant_id: str, query_vector: List[float]
+    ) -> Optional[Tuple[List[float], List[Dict[str, Any]]]]:
+        # Devuelve el vector con el que se hizo la busqueda y sus resultados;
+        # los scores siguen referidos a ese vector, no al de la consulta nueva.
+        query = normalize_rows(as_matrix([query_vector]))[0]
+        with self._lock:
+            last = self._sessions.get(session_id)
+            reusable = (
+                last is not None
+                and last.tenant_id == tenant_id
+                and last.version == self._versions.get(tenant_id)
+                and float(last.normalized @ query) >= self._similarity_threshold
+            )
+            if reusable:
+                self._sessions.move_to_end(session_id)
+                self.hits += 1
+            else:
+                self.misses += 1
+        record_cache("retrieval", reusable)
+        if not reusable:
+            return None
+        memories = last.memories
+        if last.vectors is not None:
+            memories = [
+                dict(memory, vector=vector)
+                for memory, vector in zip(memories, last.vectors.tolist())
+            ]
+        return last.query_vector.tolist(), memories
+
+    def put(
+        self,
+        session_id: str,
+        tenant_id: str,
+        query_vector: List[float],
+        memories: List[Dict[str, Any]],
+    ) -> None:
+        stored_vector = as_matrix([query_vector])[0]
+        stripped, vectors = _split_vectors(memories)
+        entry = _LastRetrieval(
+            tenant_id=tenant_id,
+            query_vector=stored_vector,
+            normalized=normalize_rows(stored_vector),
+            version=self._versions.get(tenant_id),
+            memories=stripped,
+            vectors=vectors,
+        )
+        with self._lock:
+            self._sessions[session_id] = entry
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self._max_sessions:
+                self._sessions.popitem(last=False)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "sessions": len(self._sessions),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,130 @@
+from dataclasses import dataclass, field
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from backend.config import Settings
+
+
+logger = logging.getLogger(__name__)
+
+_WARMUP_TEXT = "hola"
+
+
+@dataclass
+class Runtime:
+    settings: Settings
+    graph: Any
+    summarizer: Any = None
+    readiness: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+
+    @property
+    def ready(self) -> bool:
+        return all(check["ok"] for check in self.readiness.values())
+
+
+def _one_token_kwargs(settings: Settings) -> Dict[str, Any]:
+    if settings.llm_provider == "openai":
+        return {"max_tokens": 1}
+    return {"options": {"num_predict": 1}}
+
+
+def _ping_store(store) -> None:
+    if not store.ping():
+        raise RuntimeError(
+            "La coleccion de memorias no existe; ejecuta "
+            "python -m backend.bootstrap_qdrant."
+        )
+
+
+def _check(name: str, probe: Callable[[], Any]) -> Dict[str, Any]:
+    started = time.perf_counter()
+    try:
+        probe()
+    except Exception as exc:
+        logger.warning("Calentamiento de %s fallido: %s", name, exc)
+        error: Optional[str] = str(exc)
+    else:
+        error = None
+    return {
+        "ok": error is None,
+        "seconds": time.perf_counter() - started,
+        "error": error,
+    }
+
+
+def warm_up(
+    settings: Settings, chat_model, embeddings, store
+) -> Dict[str, Dict[str, Any]]:
+    from backend.embedding_cache import CachedEmbeddings
+
+    # El embedding se pide al modelo real y no a la cache, para que Ollama
+    # cargue el modelo en memoria aunque el texto ya este cacheado.
+    if isinstance(embeddings, CachedEmbeddings):
+        embeddings = embeddings.model
+    readiness = {
+        "store": _check("store", lambda: _ping_store(store)),
+        "embeddings": _check(
+            "embeddings", lambda: embeddings.embed_query(_WARMUP_TEXT)
+        ),
+        "chat_model": _check(
+            "chat_model",
+            lambda: chat_model.invoke(_WARMUP_TEXT, **_one_token_kwargs(settings)),
+        ),
+    }
+    summary = ", ".join(
+        f"{name}={'ok' if check['ok'] else 'error'} ({check['seconds']:.2f}s)"
+        for name, check in readiness.items()
+    )
+    logger.info("Calentamiento terminado: %s", summary)
+    return readiness
+
+
+def _build_runtime(settings: Settings) -> Runtime:
+    # LangChain, LangGraph y los clientes de Qdrant se importan aqui y no al
+    # cargar el modulo, para que la pagina de login no pague ese coste.
+    from backend.context_packer import HistorySummarizer, get_token_counter
+    from backend.llm import get_chat_model, get_embedding_model
+    from backend.memory_agent import build_memory_graph
+    from backend.memory_store import get_memory_store
+
+    chat_model = get_chat_model(settings)
+    embeddings = get_embedding_model(settings)
+    store = get_memory_store(settings)
+    graph = build_memory_graph(
+        settings, chat_model=chat_model, embeddings=embeddings, store=store
+    )
+    summarizer = HistorySummarizer(
+        chat_model,
+        get_token_counter(settings),
+        settings.history_token_budget,
+        settings.history_max_messages,
+        settings.summary_max_tokens,
+    )
+    runtime = Runtime(settings=settings, graph=graph, summarizer=summarizer)
+    if settings.warmup_enabled:
+        runtime.readiness = warm_up(settings, chat_model, embeddings, store)
+    return runtime
+
+
+_runtime: Optional[Runtime] = None
+_runtime_lock = threading.Lock()
+
+
+def get_runtime(settings: Settings) -> Runtime:
+    global _runtime
+    with _runtime_lock:
+        if _runtime is None:
+            _runtime = _build_runtime(settings)
+        return _runtime
+
+
+def start_warmup(settings: Settings) -> threading.Thread:
+    # Construye y calienta el runtime mientras el usuario ve el login; el
+    # primer turno de chat solo espera si el calentamiento aun no termino.
+    thread = threading.Thread(
+        target=get_runtime, args=(settings,), name="runtime-warmup", daemon=True
+    )
+    thread.start()
+    return thread
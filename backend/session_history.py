@@ -0,0 +1,93 @@
+from dataclasses import dataclass, field
+import json
+import os
+import threading
+import weakref
+from typing import Any, Dict, List
+
+from backend.utils import new_uuid
+
+
+Message = Dict[str, Any]
+
+
+@dataclass
+class RollingSummary:
+    text: str = ""
+    # Cantidad de mensajes del inicio del historial ya incluidos en el resumen.
+    covered: int = 0
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+
+def _remove_file(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class SessionHistory:
+    def __init__(self, spill_dir: str, hot_size: int) -> None:
+        self.session_id = new_uuid()
+        self._hot: List[Message] = []
+        self._hot_size = max(1, hot_size)
+        # Offsets en bytes de cada mensaje volcado al archivo append-only.
+        self._offsets: List[int] = []
+        os.makedirs(spill_dir, exist_ok=True)
+        self._path = os.path.join(spill_dir, f"{self.session_id}.jsonl")
+        # El archivo se borra cuando la sesion de Streamlit libera el objeto.
+        self._finalizer = weakref.finalize(self, _remove_file, self._path)
+        self.summary = RollingSummary()
+
+    def __len__(self) -> int:
+        return len(self._offsets) + len(self._hot)
+
+    def append(self, message: Message) -> None:
+        self._hot.append(message)
+        if len(self._hot) > 2 * self._hot_size:
+            self._spill(len(self._hot) - self._hot_size)
+
+    def hot(self) -> List[Message]:
+        return self._hot
+
+    def last(self) -> Message:
+        return self._hot[-1]
+
+    def tail(self, limit: int) -> List[Message]:
+        total = len(self)
+        if limit <= 0 or limit > total:
+            limit = total
+        missing = limit - len(self._hot)
+        if missing <= 0:
+            return self._hot[-limit:] if limit else []
+        spilled = len(self._offsets)
+        return self._read_spilled(spilled - missing, spilled) + list(self._hot)
+
+    def unsummarized(self, limit: int = 0) -> List[Message]:
+        count = len(self) - self.summary.covered
+        if count <= 0:
+            return []
+        if limit > 0:
+            count = min(count, limit)
+        return self.tail(count)
+
+    def _spill(self, count: int) -> None:
+        with open(self._path, "ab") as handle:
+            for message in self._hot[:count]:
+                self._offsets.append(handle.tell())
+                handle.write(json.dumps(message, ensure_ascii=False).encode("utf-8"))
+                handle.write(b"\n")
+        del self._hot[:count]
+
+    def _read_spilled(self, start: int, stop: int) -> List[Message]:
+        if start >= stop:
+            return []
+        messages = []
+        with open(self._path, "rb") as handle:
+            handle.seek(self._offsets[start])
+            for _ in range(stop - start):
+                messages.append(json.loads(handle.readline()))
+        return messages
+
+    def close(self) -> None:
+        self._finalizer()
@@ -0,0 +1,65 @@
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+import re
+from typing import Callable, Deque, Iterator, List, Tuple
+
+
+SynthesizeFn = Callable[[str], Tuple[bytes, str]]
+
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?\N{HORIZONTAL ELLIPSIS}])\s+")
+
+
+def split_sentences(text: str) -> Tuple[List[str], str]:
+    parts = _SENTENCE_BOUNDARY.split(text)
+    sentences = [part.strip() for part in parts[:-1] if part.strip()]
+    return sentences, parts[-1]
+
+
+class SentenceSynthesizer:
+    def __init__(
+        self, synthesize: SynthesizeFn, max_workers: int, min_chars: int = 40
+    ) -> None:
+        self._synthesize = synthesize
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, max_workers), thread_name_prefix="tts"
+        )
+        self._min_chars = min_chars
+        self._buffer = ""
+        self._sentence = ""
+        self._pending: Deque["Future[Tuple[bytes, str]]"] = deque()
+
+    def _submit(self, text: str) -> None:
+        text = text.strip()
+        if text:
+            self._pending.append(self._executor.submit(self._synthesize, text))
+
+    def feed(self, token: str) -> None:
+        self._buffer += token
+        sentences, self._buffer = split_sentences(self._buffer)
+        for sentence in sentences:
+            # Las frases muy cortas se agrupan para no pagar una llamada por cada una.
+            self._sentence = f"{self._sentence} {sentence}".strip()
+            if len(self._sentence) >= self._min_chars:
+                self._submit(self._sentence)
+                self._sentence = ""
+
+    def ready(self) -> Iterator["Future[Tuple[bytes, str]]"]:
+        while self._pending and self._pending[0].done():
+            yield self._pending.popleft()
+
+    def close(self) -> Iterator["Future[Tuple[bytes, str]]"]:
+        self._submit(f"{self._sentence} {self._buffer}")
+        self._sentence = ""
+        self._buffer = ""
+        try:
+            while self._pending:
+                yield self._pending.popleft()
+        finally:
+            self._executor.shutdown(wait=False)
+
+    def cancel(self) -> None:
+        for future in self._pending:
+            future.cancel()
+        self._pending.clear()
+        self._sentence = ""
+        self._buffer = ""
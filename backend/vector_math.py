@@ -0,0 +1,27 @@
+import math
+from typing import Sequence
+
+import numpy as np
+
+
+def as_matrix(vectors: Sequence[Sequence[float]]) -> np.ndarray:
+    return np.asarray(vectors, dtype=np.float32).reshape(len(vectors), -1)
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def cosine_similarities(
+    matrix: np.ndarray, query: Sequence[float]
+) -> np.ndarray:
+    if matrix.size == 0:
+        return np.zeros(0, dtype=np.float32)
+    query_vec = normalize_rows(np.asarray(query, dtype=np.float32))
+    return normalize_rows(matrix) @ query_vec
+
+
+def cosine_to_angle(score: float) -> float:
+    return math.acos(max(-1.0, min(1.0, float(score))))
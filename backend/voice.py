@@ -1,42 +1,46 @@
-from typing import Optional, Tuple
+import asyncio
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
 
+import httpx
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from backend.config import Settings
+from backend.metrics import measure
 
 
-def transcribe_audio(
+_RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+def _stt_request(
     settings: Settings, audio_bytes: bytes, mime_type: Optional[str]
-) -> str:
+) -> Dict[str, Any]:
     if not settings.elevenlabs_api_key:
         raise ValueError("Falta configurar ELEVENLABS_API_KEY.")
-    url = "https://api.elevenlabs.io/v1/speech-to-text"
-    headers = {"xi-api-key": settings.elevenlabs_api_key}
-    data = {"model_id": settings.elevenlabs_stt_model}
-    files = {
-        "file": (
-            "recording.webm",
-            audio_bytes,
-            mime_type or "audio/webm",
-        )
+    return {
+        "url": f"{settings.elevenlabs_base_url}/v1/speech-to-text",
+        "headers": {"xi-api-key": settings.elevenlabs_api_key},
+        "data": {"model_id": settings.elevenlabs_stt_model},
+        "files": {
+            "file": (
+                "recording.webm",
+                audio_bytes,
+                mime_type or "audio/webm",
+            )
+        },
     }
-    response = requests.post(
-        url, headers=headers, data=data, files=files, timeout=60
-    )
-    response.raise_for_status()
-    payload = response.json()
-    return (payload.get("text") or "").strip()
 
 
-def text_to_speech(
-    settings: Settings, text: str
-) -> Tuple[bytes, str]:
+def _tts_request(settings: Settings, text: str) -> Dict[str, Any]:
     if not settings.elevenlabs_api_key:
         raise ValueError("Falta configurar ELEVENLABS_API_KEY.")
     if not settings.elevenlabs_voice_id:
         raise ValueError("Falta configurar ELEVENLABS_VOICE_ID.")
     url = (
-        "https://api.elevenlabs.io/v1/text-to-speech/"
+        f"{settings.elevenlabs_base_url}/v1/text-to-speech/"
         f"{settings.elevenlabs_voice_id}"
     )
     headers = {
@@ -50,8 +54,209 @@ def text_to_speech(
     }
     if settings.elevenlabs_output_format:
         payload["output_format"] = settings.elevenlabs_output_format
-    response = requests.post(
-        url, headers=headers, json=payload, timeout=90
-    )
-    response.raise_for_status()
+    return {"url": url, "headers": headers, "json": payload}
+
+
+class _CallMetrics:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, Dict[str, float]] = {}
+
+    def _record(self, name: str, seconds: float, failed: bool) -> None:
+        with self._lock:
+            metric = self._metrics.setdefault(
+                name,
+                {"calls": 0, "errors": 0, "total_seconds": 0.0, "last_seconds": 0.0},
+            )
+            metric["calls"] += 1
+            metric["errors"] += int(failed)
+            metric["total_seconds"] += seconds
+            metric["last_seconds"] = seconds
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {name: dict(metric) for name, metric in self._metrics.items()}
+
+
+class ElevenLabsClient(_CallMetrics):
+    def __init__(
+        self,
+        pool_size: int,
+        max_retries: int,
+        backoff_seconds: float,
+    ) -> None:
+        super().__init__()
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=backoff_seconds,
+            status_forcelist=_RETRY_STATUSES,
+            allowed_methods=frozenset({"POST"}),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=max(1, pool_size),
+            pool_maxsize=max(1, pool_size),
+            max_retries=retry,
+        )
+        self._session = requests.Session()
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+
+    def post(self, name: str, timeout: float, **request: Any) -> requests.Response:
+        started = time.perf_counter()
+        failed = True
+        try:
+            with measure(f"elevenlabs.{name}"):
+                response = self._session.post(timeout=timeout, **request)
+                response.raise_for_status()
+            failed = False
+            return response
+        finally:
+            self._record(name, time.perf_counter() - started, failed)
+
+    def close(self) -> None:
+        self._session.close()
+
+
+def _retry_delay(
+    response: Optional[httpx.Response], backoff: float, attempt: int
+) -> float:
+    # Misma politica que urllib3: backoff exponencial, salvo que el servidor
+    # indique Retry-After en segundos.
+    retry_after = response.headers.get("retry-after") if response else None
+    if retry_after and retry_after.isdigit():
+        return float(retry_after)
+    return backoff * (2**attempt)
+
+
+class AsyncElevenLabsClient(_CallMetrics):
+    def __init__(
+        self,
+        pool_size: int,
+        max_retries: int,
+        backoff_seconds: float,
+    ) -> None:
+        super().__init__()
+        self._max_retries = max(0, max_retries)
+        self._backoff = max(0.0, backoff_seconds)
+        # El cliente se crea en la primera llamada, dentro del event loop que
+        # lo va a usar.
+        self._limits = httpx.Limits(
+            max_connections=max(1, pool_size),
+            max_keepalive_connections=max(1, pool_size),
+        )
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _http(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(limits=self._limits)
+        return self._client
+
+    async def _send(self, timeout: float, request: Dict[str, Any]) -> httpx.Response:
+        attempt = 0
+        while True:
+            try:
+                response = await self._http().post(timeout=timeout, **request)
+            except httpx.TransportError:
+                if attempt >= self._max_retries:
+                    raise
+                response = None
+            else:
+                if (
+                    response.status_code not in _RETRY_STATUSES
+                    or attempt >= self._max_retries
+                ):
+                    return response
+            await asyncio.sleep(_retry_delay(response, self._backoff, attempt))
+            attempt += 1
+
+    async def post(self, name: str, timeout: float, **request: Any) -> httpx.Response:
+        started = time.perf_counter()
+        failed = True
+        try:
+            with measure(f"elevenlabs.{name}"):
+                response = await self._send(timeout, request)
+                response.raise_for_status()
+            failed = False
+            return response
+        finally:
+            self._record(name, time.perf_counter() - started, failed)
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+_client: Optional[ElevenLabsClient] = None
+_async_client: Optional[AsyncElevenLabsClient] = None
+_client_lock = threading.Lock()
+
+
+def get_elevenlabs_client(settings: Settings) -> ElevenLabsClient:
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = ElevenLabsClient(
+                settings.elevenlabs_pool_size,
+                settings.elevenlabs_max_retries,
+                settings.elevenlabs_backoff_seconds,
+            )
+        return _client
+
+
+def get_async_elevenlabs_client(settings: Settings) -> AsyncElevenLabsClient:
+    global _async_client
+    with _client_lock:
+        if _async_client is None:
+            _async_client = AsyncElevenLabsClient(
+                settings.elevenlabs_pool_size,
+                settings.elevenlabs_max_retries,
+                settings.elevenlabs_backoff_seconds,
+            )
+        return _async_client
+
+
+def transcribe_audio(
+    settings: Settings,
+    audio_bytes: bytes,
+    mime_type: Optional[str],
+    client: Optional[ElevenLabsClient] = None,
+) -> str:
+    request = _stt_request(settings, audio_bytes, mime_type)
+    client = client or get_elevenlabs_client(settings)
+    response = client.post("speech_to_text", timeout=60, **request)
+    payload = response.json()
+    return (payload.get("text") or "").strip()
+
+
+def text_to_speech(
+    settings: Settings, text: str, client: Optional[ElevenLabsClient] = None
+) -> Tuple[bytes, str]:
+    request = _tts_request(settings, text)
+    client = client or get_elevenlabs_client(settings)
+    response = client.post("text_to_speech", timeout=90, **request)
+    return response.content, "audio/mpeg"
+
+
+async def atranscribe_audio(
+    settings: Settings,
+    audio_bytes: bytes,
+    mime_type: Optional[str],
+    client: Optional[AsyncElevenLabsClient] = None,
+) -> str:
+    request = _stt_request(settings, audio_bytes, mime_type)
+    client = client or get_async_elevenlabs_client(settings)
+    response = await client.post("speech_to_text", timeout=60, **request)
+    payload = response.json()
+    return (payload.get("text") or "").strip()
+
+
+async def atext_to_speech(
+    settings: Settings, text: str, client: Optional[AsyncElevenLabsClient] = None
+) -> Tuple[bytes, str]:
+    request = _tts_request(settings, text)
+    client = client or get_async_elevenlabs_client(settings)
+    response = await client.post("text_to_speech", timeout=90, **request)
     return response.content, "audio/mpeg"
@@ -0,0 +1,90 @@
+import argparse
+import ast
+import json
+import os
+import subprocess
+import sys
+from typing import Dict, List, Optional
+
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "app.py")
+HEAVY_MODULES = (
+    "langchain_core",
+    "langchain_ollama",
+    "langchain_openai",
+    "langgraph",
+    "qdrant_client",
+    "numpy",
+    "httpx",
+    "requests",
+)
+RUNTIME_MODULES = ("backend.memory_agent", "backend.voice")
+
+_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+for name in sys.argv[2:]:
+    __import__(name)
+elapsed = (time.perf_counter() - started) * 1000
+heavy = [name for name in json.loads(sys.argv[1]) if name in sys.modules]
+print(json.dumps({"ms": elapsed, "heavy": heavy}))
+"""
+
+
+def login_modules(app_path: str = APP_PATH) -> List[str]:
+    with open(app_path, "r", encoding="utf-8") as handle:
+        tree = ast.parse(handle.read())
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.ImportFrom) and node.module:
+            names = [node.module]
+        elif isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        else:
+            continue
+        modules.extend(name for name in names if name.startswith("backend"))
+    return modules
+
+
+def measure_imports(modules: List[str], repeat: int) -> Dict[str, object]:
+    # Cada medicion corre en un interprete nuevo para no reutilizar modulos
+    # ya cargados; se reporta la mejor de varias repeticiones.
+    runs = []
+    for _ in range(max(1, repeat)):
+        output = subprocess.run(
+            [sys.executable, "-c", _PROBE, json.dumps(HEAVY_MODULES), *modules],
+            check=True,
+            capture_output=True,
+            text=True,
+            cwd=os.path.dirname(APP_PATH),
+        ).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+    return min(runs, key=lambda run: run["ms"])
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Mide el coste de importar los modulos que carga el login."
+    )
+    parser.add_argument("--budget-ms", type=float, default=300.0)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    modules = login_modules()
+    login = measure_imports(modules, args.repeat)
+    full = measure_imports(modules + list(RUNTIME_MODULES), args.repeat)
+    print(f"login ({', '.join(modules)}): {login['ms']:.1f} ms")
+    print(f"login + runtime: {full['ms']:.1f} ms")
+
+    failed = False
+    if login["heavy"]:
+        print(f"ERROR el login importa: {', '.join(login['heavy'])}")
+        failed = True
+    if login["ms"] > args.budget_ms:
+        print(f"ERROR el login supera el presupuesto de {args.budget_ms:.0f} ms")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
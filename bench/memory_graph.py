@@ -0,0 +1,208 @@
+import argparse
+import dataclasses
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Any, Dict, List, Optional
+
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from backend.config import get_settings
+from backend.local_store import LocalVectorStore
+from backend.memory_agent import build_memory_graph, run_chat
+from backend.metrics import registry
+from backend.prompts import MEMORY_DECIDER_SYSTEM_PROMPT
+
+
+DEFAULT_CORPUS = (
+    "hola",
+    "Me gusta el cafe sin azucar por las mananas",
+    "Estoy trabajando en un proyecto de robotica llamado Atlas",
+    "que me recomiendas para cenar hoy?",
+    "gracias!",
+    "Mi hermana se llama Laura y vive en Valencia",
+    "Prefiero que me respondas en frases cortas",
+    "Que recuerdas de mi proyecto?",
+    "Trabajo como enfermera en el turno de noche",
+    "Cuentame un chiste",
+    "Odio el futbol pero me encanta el tenis",
+    "ok, perfecto",
+)
+PERCENTILES = (50, 95, 99)
+
+
+class FakeChatModel(BaseChatModel):
+    latency_seconds: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "bench-fake-chat"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+        user_text = str(messages[-1].content)
+        if messages[0].content == MEMORY_DECIDER_SYSTEM_PROMPT:
+            text = user_text.rsplit("Usuario:", 1)[-1].split("\n", 1)[0].strip()
+            content = json.dumps(
+                {
+                    "should_store": True,
+                    "memory": {"memory_type": "fact", "text": text, "importance": 3},
+                }
+            )
+        else:
+            content = f"Respuesta de prueba para: {user_text}"
+        message = AIMessage(content=content)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+def _percentile(values: List[float], percentile: int) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(percentile / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def _summarize(values: List[float], scale: float) -> Dict[str, float]:
+    summary = {f"p{p}": _percentile(values, p) * scale for p in PERCENTILES}
+    summary["mean"] = statistics.fmean(values) * scale if values else 0.0
+    summary["count"] = len(values)
+    return summary
+
+
+def _load_corpus(path: Optional[str]) -> List[Dict[str, str]]:
+    if not path:
+        return [{"tenant_id": "", "message": message} for message in DEFAULT_CORPUS]
+    with open(path, "r", encoding="utf-8") as handle:
+        return [json.loads(line) for line in handle if line.strip()]
+
+
+def run_benchmark(
+    turns: int, tenants: int, chat_latency_ms: float, corpus_path: Optional[str]
+) -> Dict[str, Any]:
+    settings = dataclasses.replace(
+        get_settings(),
+        memory_write_batch_size=1,
+        memory_write_max_delay_seconds=0.0,
+        embedding_cache_size=0,
+    )
+    graph = build_memory_graph(
+        settings,
+        chat_model=FakeChatModel(latency_seconds=chat_latency_ms / 1000),
+        embeddings=DeterministicFakeEmbedding(size=256),
+        store=LocalVectorStore(),
+    )
+    corpus = _load_corpus(corpus_path)
+    histories: Dict[str, List[Dict[str, str]]] = {}
+    turn_seconds: List[float] = []
+    peak_kib: List[float] = []
+
+    registry.reset()
+    registry.enabled = True
+    tracemalloc.start()
+    try:
+        for index in range(turns):
+            entry = corpus[index % len(corpus)]
+            tenant_id = entry.get("tenant_id") or f"bench-{index % tenants}"
+            history = histories.setdefault(tenant_id, [])
+            tracemalloc.reset_peak()
+            started = time.perf_counter()
+            answer = run_chat(graph, tenant_id, entry["message"], history)
+            turn_seconds.append(time.perf_counter() - started)
+            peak_kib.append(tracemalloc.get_traced_memory()[1] / 1024)
+            history.extend(
+                [
+                    {"role": "user", "content": entry["message"]},
+                    {"role": "assistant", "content": answer},
+                ]
+            )
+        # Deja terminar los guardados en segundo plano antes de leer tiempos.
+        time.sleep(0.5)
+    finally:
+        tracemalloc.stop()
+        registry.enabled = False
+
+    nodes = {
+        name: _summarize(values, 1000)
+        for name, values in sorted(registry.samples().items())
+    }
+    return {
+        "turns": turns,
+        "nodes_ms": nodes,
+        "turn_ms": _summarize(turn_seconds, 1000),
+        "peak_alloc_kib": _summarize(peak_kib, 1),
+    }
+
+
+def compare_with_baseline(
+    result: Dict[str, Any], baseline: Dict[str, Any], tolerance: float
+) -> List[str]:
+    regressions = []
+    pairs = [("turn_ms", result["turn_ms"], baseline.get("turn_ms", {}))]
+    for name, summary in result["nodes_ms"].items():
+        pairs.append((name, summary, baseline.get("nodes_ms", {}).get(name, {})))
+    pairs.append(
+        ("peak_alloc_kib", result["peak_alloc_kib"], baseline.get("peak_alloc_kib", {}))
+    )
+    for name, current, previous in pairs:
+        before = previous.get("p95")
+        if not before:
+            continue
+        after = current["p95"]
+        if after > before * (1 + tolerance):
+            regressions.append(f"{name}: p95 {before:.3f} -> {after:.3f}")
+    return regressions
+
+
+def _print_report(result: Dict[str, Any]) -> None:
+    header = f"{'metrica':<22}" + "".join(f"{'p' + str(p):>10}" for p in PERCENTILES)
+    print(header)
+    rows = [(f"{name} (ms)", summary) for name, summary in result["nodes_ms"].items()]
+    rows.append(("turno (ms)", result["turn_ms"]))
+    rows.append(("pico memoria (KiB)", result["peak_alloc_kib"]))
+    for label, summary in rows:
+        print(
+            f"{label:<22}"
+            + "".join(f"{summary[f'p{p}']:>10.3f}" for p in PERCENTILES)
+        )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Mide la latencia por nodo del grafo de memoria sin red."
+    )
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--tenants", type=int, default=4)
+    parser.add_argument("--chat-latency-ms", type=float, default=0.0)
+    parser.add_argument("--corpus", help="JSONL con campos tenant_id y message.")
+    parser.add_argument("--save-baseline", help="Guarda el resultado como JSON.")
+    parser.add_argument("--baseline", help="Compara contra un JSON guardado.")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    result = run_benchmark(
+        args.turns, args.tenants, args.chat_latency_ms, args.corpus
+    )
+    _print_report(result)
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as handle:
+            json.dump(result, handle, indent=2)
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as handle:
+            baseline = json.load(handle)
+        regressions = compare_with_baseline(result, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESION {regression}")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())